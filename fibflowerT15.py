@@ -7,6 +7,70 @@ separate threads. Each thread provides the main thread with a draw routine and
 semaphore to sync the object's output with the graphics library draw control
 interface. So the main thread does all the drawing.
 
+Updated 18/10/2026
+Seedhead layouts are calculated in one batch with numpy by seedSpiral().
+There is no longer a frameTimer() sleep per seed, so a new head can start
+unfolding straight away.
+Layouts are shared between all seedhead tasks through layout_cache, a bounded
+LRU cache. A new head is just its cached layout moved to the head position.
+Set stats_period to have the cache hit/miss counts printed.
+Seeds are now created lazily by a generator as unfoldPattern reveals them.
+Each seedhead task builds its next head while the current one is on screen,
+so swapping heads no longer leaves a gap.
+Setting layout_store_file precomputes the layouts for all the specs in a
+process pool and keeps them in a memory mapped file for later runs.
+SeedCuller skips drawing static seeds completely hidden under another seed of
+the same colour, across all the heads on screen.
+Layouts now honour each spec's scale, and its 'law' picks the spiral kernel:
+the original linear radius, Vogel's sqrt radius or a log radius.
+A seedhead's seeds are kept as arrays in a SeedBatch and flown in one go.
+Seed objects are only made for drawn seeds, and are pooled for reuse.
+Seeds and stars are drawn through a CanvasRecycler, which hides and reuses
+canvas items rather than Tk deleting and creating them every frame.
+main() reads the clock once per frame through frame_clock and passes that
+time to every drawable.
+Moving seeds that fly out past the window edge are retired by viewport_culler
+so they stop being moved, and a fold doesn't wait on them.
+A spec's 'flight' can be 'closed' to work out each moving seed's position
+straight from its start time and the frame time, rather than stepping it on
+from the last frame.
+Every seed of a head carries a canvas tag of the head's, so a whole head can
+be moved, hidden, recoloured or undrawn with one Tk call. A task asks for the
+change and the head's draw() makes it at the start of the next frame.
+Tasks register what they draw in draw_registry, keyed by task id. main()
+draws from its snapshot, which is only rebuilt when a task changes it.
+Setting render_backend to 'raster' draws everything into a numpy frame buffer
+with a RasterCanvas, which goes on the window as one image per frame.
+Setting offline_output renders the animation to PNG or raw RGB files with no
+window, on a VirtualClock with a fixed seed, as fast as it can be drawn.
+Everything is drawn through a RenderBackend picked by render_backend: the Tk
+canvas, graphics.py objects, the raster frame buffer, or 'null' which draws
+nothing and counts the calls, to time the animation without the drawing.
+The starfield keeps its stars in arrays and moves them all in one numpy step
+per frame, restarting the ones that leave the window through a mask, so big
+windows can afford a higher star_density.
+Each star keeps one canvas item for good, which is drawn as a one pixel line
+until the star is big enough to streak, and is just moved and recoloured.
+The Tk colour strings for colours are made once by palette, each with a ramp
+of colour_levels shades, so stars and seeds look their colour up by index.
+A seedhead counts the seeds waiting to be drawn or undrawn as draw() gets to
+them, so unfoldPattern and foldPattern are woken through a condition when
+their head is done, rather than scanning all its seeds every frame.
+Sequencer pauses and resumes tasks through an event per task, so a warp
+starts as soon as task 3 has paused and tasks are released as soon as it
+ends. Each then restarts after a random jitter of up to 8 seconds on purpose,
+rather than as a side effect of polling its pause flag every 8 seconds.
+The tasks are now written as steps() generators that yield their waits, so
+they can run as threads or, with task_mode 'asyncio', as coroutines on one
+event loop that main() runs between frames. task_timing prints how late
+tasks wake, the frame jitter and the context switches per frame, for
+comparing the two.
+Setting flight_processes flies the stars and the moving seedheads in that
+many worker processes, a FlightSim, each taking a slice of them. The star
+arrays and each seedhead's flight arrays are in shared memory, which the
+render loop draws straight from. A generation counter per job makes sure a
+frame's stars and seeds are all moved before they are drawn.
+
 Updated 7-9/06/280x720
 The sequencer now provides control over the starfield warp. This is a simulation
 of accelleration through the starfield and flying though a 'psychedelic' warp. 
@@ -33,22 +97,59 @@ SRR 16/04/2020
 Original seedhead threaded code.
 '''
 
-from ctypes import windll
-from graphics import *
+try:
+    from ctypes import windll
+except ImportError:
+    # Not on windows, eg rendering offline on a server
+    windll = None
+try:
+    import resource
+except ImportError:
+    # Not on unix, so no context switch counts
+    resource = None
+try:
+    import tkinter as tk
+    TclError = tk.TclError
+except ImportError:
+    # No Tk at all, eg a server that only renders offline
+    tk = None
+    TclError = ImportError
+try:
+    from graphics import *
+    graphics_error = None
+except (ImportError, TclError) as e:
+    # graphics.py opens its Tk root as it is imported, which fails with no
+    # display. Only main() needs it, renderOffline() runs without
+    graphics_error = e
+    GraphWin = object
+import numpy as np
 import math
 import random
 import time
 import threading
 import os
-
-
-#import sys
+import json
+import struct
+import heapq
+import zlib
+import asyncio
+import traceback
+import weakref
+import multiprocessing
+from multiprocessing import shared_memory
+from abc import ABC, ABCMeta, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+
+import sys
 sys.setswitchinterval(1)
 
-timeBeginPeriod = windll.winmm.timeBeginPeriod
-# set windows system timer to 1mS tick
+if windll is not None:
+    timeBeginPeriod = windll.winmm.timeBeginPeriod
+    # set windows system timer to 1mS tick
 
-timeBeginPeriod(1)
+    timeBeginPeriod(1)
 slug_factor = 1.5
 frameTime = 0.02 * slug_factor
 flight_period_const = 0.3 / slug_factor
@@ -57,6 +158,41 @@ lull_period = lull_period_const
 lull_increment = 0.004
 lull_decrement = 0.004
 star_density = 0.04
+# Max number of seedhead layouts held by layout_cache
+layout_cache_size = 64
+# Seconds between printing performance stats, 0 = off
+stats_period = 0
+# File to keep precomputed seedhead layouts in between runs, None = off
+layout_store_file = None
+# Don't create canvas items for static seeds that would be completely hidden
+cull_hidden_seeds = True
+cull_cell_size = 8
+# Moving seeds this many pixels beyond the window edge are retired, None = off
+offscreen_margin = 20
+# Max number of undrawn Seeds kept for reuse by seed_pool
+seed_pool_size = 5000
+# Max number of hidden canvas items kept for reuse by the CanvasRecycler
+canvas_pool_size = 5000
+# What to draw with: 'tk' canvas items, 'graphics' graphics.py objects,
+# 'raster' a frame buffer shown as one image, or 'null' for nothing at all
+render_backend = 'tk'
+# Render offline to files rather than to the window, None = off. A .png name
+# is a pattern for a file per frame, eg 'frames/f{:05}.png', anything else is
+# one file of all the frames as raw RGB
+offline_output = None
+offline_seconds = 600
+offline_fps = 30
+offline_seed = 1
+# How the seedhead and starfield tasks run: 'threads', or 'asyncio' for
+# coroutines on one event loop that the frame loop runs between frames
+task_mode = 'threads'
+# Worker processes flying the stars and the moving seedheads, each a slice
+# of them, 0 = all flown in this process
+flight_processes = 0
+# Seedheads the workers can fly at once. Any more fly in this process
+flight_slots = 40
+# Shades of each colour palette holds, from black up to the full colour
+colour_levels = 64
 
 Fib_ratio = 0.618
 Phi = 1.618034  # the inverse of Fib_ratio
@@ -66,6 +202,7 @@ head_shape_choices = [Fib_ratio, 0.45, 0.53, Fib_ratio, 0.57, Fib_ratio, 0.71]
 # There are 2Pi Rads in a circle
 radsInADegree = math.pi * 2 / 360
 dToRads = math.radians(1)
+# The seed count the vogel and log spiral laws match the linear one at
 seeds = 700
 scale = 0.5
 #	1,920 x 1,080
@@ -81,7 +218,10 @@ centerY = winHt / 2.0
 mouse_x = 0
 mouse_y = 0
 
-draw_control_ary = []
+# The Tk colours used by name, for drawing without a window
+colour_names = {'black': (0, 0, 0), 'white': (255, 255, 255),
+                'red': (255, 0, 0), 'green': (0, 255, 0), 'blue': (0, 0, 255),
+                'yellow': (255, 255, 0)}
 
 # A list of colours for seedhead seeds in each iteration
 # random.range for r g b doesn't provide enough control over the colours
@@ -134,72 +274,1237 @@ colours = [(255, 0, 0),
            (145, 145, 145)]
 
 user_exit = False
+# The CanvasRecycler main() draws everything through
+canvas_items = None
 
 #######################################
 # Classes
 
 
+class RealClock():
+    """
+    The clock the tasks sleep and wait on, task_clock. Normally it is just
+    the system clock, renderOffline() swaps in a VirtualClock. Timings of how
+    long things take to run always use the time module itself.
+    """
+    virtual = False
+
+    def time(self):
+        return time.time()
+
+    def sleep(self, secs):
+        time.sleep(secs)
+
+    def wait_for(self, cond, predicate):
+        # Waits on the condition cond until predicate() holds, or the user
+        # exits. Whoever makes predicate() true notifies cond, so the wait
+        # ends at once, and only the odd timeout is spent checking user_exit
+        with cond:
+            while not (predicate() or user_exit):
+                cond.wait(0.25)
+
+    def wait_event(self, event):
+        # Waits for event to be set, or the user to exit
+        while not (event.wait(0.25) or user_exit):
+            pass
+
+
+task_clock = RealClock()
+
+###########
+
+
+class FrameClock():
+    """
+    The time of the current frame. main() ticks it once per frame and it is
+    passed to every drawable, so all the seeds fly to the same time without
+    each one reading the system clock.
+    """
+
+    def __init__(self):
+        self.now = task_clock.time()
+        self.frame = 0
+
+    def tick(self):
+        self.now = task_clock.time()
+        self.frame += 1
+        return self.now
+
+
+frame_clock = FrameClock()
+
+###########
+
+
+class Palette():
+    """
+    The Tk colour strings for every entry in colours, made once up front.
+    Each colour has a ramp of shades from black up to the full colour,
+    standing in for alpha, which graphics.py doesn't have. All the shades
+    are in one list, so a shade is found by index with no string to build.
+    """
+
+    def __init__(self, rgbs, levels):
+        self.levels = levels
+        self.shades = []
+        for rgb in rgbs:
+            for level in range(levels):
+                alpha = level / (levels - 1)
+                self.shades.append(sys.intern('#%02x%02x%02x' % tuple(
+                    math.floor(c * alpha) for c in rgb)))
+        # the full colour strings, one per entry in rgbs
+        self.colours = self.shades[levels - 1::levels]
+        self.white = rgbs.index((255, 255, 255))
+
+    def shade(self, index, alpha):
+        # The index in shades of colour index at alpha, 0 to 1. Takes
+        # arrays too
+        level = (np.minimum(alpha, 1) * (self.levels - 1)).astype(int)
+        return index * self.levels + level
+
+
+palette = Palette(colours, colour_levels)
+
+###########
+
+
+class DrawRegistry():
+    """
+    What each task has to draw, keyed by task id. Tasks register and
+    unregister from their own threads under the lock. Each change builds a
+    new snapshot tuple of the drawables in order of registration, so main()
+    can draw from the current snapshot every frame without taking the lock
+    or seeing a change half made.
+    """
+
+    def __init__(self):
+        self.drawn = {}
+        self.snapshot = ()
+        self.lock = threading.Lock()
+
+    def register(self, task_id, drawn_obj):
+        # Replacing a task's drawable keeps its place in the drawing order
+        with self.lock:
+            self.drawn[task_id] = drawn_obj
+            self.snapshot = tuple(self.drawn.values())
+
+    def unregister(self, task_id):
+        with self.lock:
+            if self.drawn.pop(task_id, None) is not None:
+                self.snapshot = tuple(self.drawn.values())
+
+
+draw_registry = DrawRegistry()
+
+###########
+
+
+class VirtualClock():
+    """
+    Stands in for the RealClock as task_clock when rendering offline. Time only moves
+    when the renderer advances it, and the tasks take turns, only one
+    running at a time until it sleeps. They wake in order of wake time, then
+    of when they went to sleep, so the same random seed gives the same
+    frames every run, and no time is spent actually sleeping.
+    """
+    virtual = True
+
+    def __init__(self, now=0.0):
+        self.now = now
+        self.sleepers = []  # Heap of (wake time, order, thread)
+        self.order = 0
+        self.running = None  # The task thread whose turn it is
+        self.threads = []
+        self.stopped = False
+        self.cond = threading.Condition()
+
+    def time(self):
+        return self.now
+
+    def _queue(self, wake, thread):
+        self.order += 1
+        heapq.heappush(self.sleepers, (wake, self.order, thread))
+
+    def _wait_turn(self, thread):
+        while self.running is not thread and not self.stopped:
+            self.cond.wait()
+
+    def sleep(self, secs):
+        # Give up the turn until secs of virtual time have gone by
+        me = threading.current_thread()
+        with self.cond:
+            if self.stopped:
+                return
+            self._queue(self.now + max(secs, 0), me)
+            self.running = None
+            self.cond.notify_all()
+            self._wait_turn(me)
+
+    def wait_for(self, cond, predicate):
+        # A task blocked on cond would stall the clock waiting for it to
+        # sleep, so it checks predicate() each frameTime of virtual time
+        while not (predicate() or user_exit):
+            self.sleep(frameTime)
+
+    def wait_event(self, event):
+        while not (event.is_set() or user_exit):
+            self.sleep(frameTime)
+
+    def start(self, thread):
+        # Start a task thread, which waits for its turn before it runs
+        run = thread.run
+
+        def take_turns():
+            with self.cond:
+                self._wait_turn(thread)
+            try:
+                run()
+            finally:
+                with self.cond:
+                    self.running = None
+                    self.cond.notify_all()
+
+        thread.run = take_turns
+        with self.cond:
+            self._queue(self.now, thread)
+        self.threads.append(thread)
+        thread.start()
+
+    def advance(self, until):
+        # Run each task due to wake by time until in turn, then move to it
+        with self.cond:
+            while self.sleepers and self.sleepers[0][0] <= until:
+                wake, order, thread = heapq.heappop(self.sleepers)
+                self.now = max(self.now, wake)
+                self.running = thread
+                self.cond.notify_all()
+                while self.running is not None:
+                    self.cond.wait()
+            self.now = until
+
+    def stop(self):
+        # Let all the tasks run free so they can see user_exit and finish
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+        for thread in self.threads:
+            thread.join()
+
+###########
+
+
+class FrameTasks():
+    """
+    Runs the tasks as coroutines on one asyncio event loop, for task_mode
+    'asyncio'. The frame loop calls run_frame() between frames, which wakes
+    every task due by the frame time and runs them all until they await
+    again, so no task runs while a frame is drawn and there are no threads
+    to switch between. A task's sleeps are timed from when it was due to
+    wake rather than from the frame it woke in, so short sleeps add up over
+    frames as they would in a thread, rather than each taking a whole frame.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.now = task_clock.time()
+        self.sleepers = []  # Heap of (wake time, order, future)
+        self.order = 0
+        self.awake = 0  # Tasks woken that haven't awaited again yet
+        self.tasks = []
+
+    def start(self, task):
+        # Run a task's steps as a coroutine from the next frame
+        self.awake += 1
+        self.tasks.append(self.loop.create_task(self._run(task.steps())))
+
+    async def _sleep_until(self, wake):
+        self.order += 1
+        future = self.loop.create_future()
+        heapq.heappush(self.sleepers, (wake, self.order, future))
+        self.awake -= 1
+        await future
+
+    async def _run(self, steps):
+        due = self.now
+        try:
+            for wait in steps:
+                if isinstance(wait, Until):
+                    # Only a frame can make it hold, so look once a frame
+                    while not (wait.predicate() or user_exit):
+                        await self._sleep_until(self.now)
+                    due = self.now
+                else:
+                    due += wait
+                    if due > self.now:
+                        await self._sleep_until(due)
+                        task_timing.woke(self.now - due)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self.awake -= 1
+
+    def run_frame(self, now):
+        # Wake the tasks due by now and run them till they all wait again
+        self.now = now
+        while self.sleepers and self.sleepers[0][0] <= now:
+            wake, order, future = heapq.heappop(self.sleepers)
+            self.awake += 1
+            future.set_result(None)
+        while self.awake > 0:
+            self.loop.run_until_complete(asyncio.sleep(0))
+
+    def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        self.loop.run_until_complete(
+            asyncio.gather(*self.tasks, return_exceptions=True))
+        self.loop.close()
+
+###########
+
+
+class TaskTiming():
+    """
+    How well the tasks keep time, to compare task_mode 'threads' with
+    'asyncio'. It counts how late tasks wake from their sleeps, how much
+    the gap between frames varies and how often the OS switches the process
+    between threads, as getrusage() counts it, where there is one.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wakes = 0
+        self.late = 0
+        self.late_max = 0
+        self.frame_time = None
+        # Running totals of the gaps between frames, so nothing piles up
+        # when stats() is never called
+        self.frames = 0
+        self.gap_sum = 0.0
+        self.gap_sq_sum = 0.0
+        self.switches = self._switches()
+
+    def _switches(self):
+        if resource is None:
+            return 0
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_nvcsw + usage.ru_nivcsw
+
+    def woke(self, late):
+        # A task woke late secs after it was due to
+        with self.lock:
+            self.wakes += 1
+            self.late += late
+            self.late_max = max(self.late_max, late)
+
+    def new_frame(self, now):
+        if self.frame_time is not None:
+            gap = now - self.frame_time
+            self.frames += 1
+            self.gap_sum += gap
+            self.gap_sq_sum += gap * gap
+        self.frame_time = now
+
+    def stats(self):
+        # Wake lateness, frame gap spread and context switches per frame
+        # since the last call
+        switches = self._switches()
+        frames = max(self.frames, 1)
+        mean = self.gap_sum / frames
+        jitter = math.sqrt(max(self.gap_sq_sum / frames - mean * mean, 0))
+        with self.lock:
+            stats = {'mode': task_mode,
+                     'wake_late_ms':
+                         round(self.late * 1000 / max(self.wakes, 1), 2),
+                     'wake_late_max_ms': round(self.late_max * 1000, 2),
+                     'frame_jitter_ms': round(jitter * 1000, 2),
+                     'context_switches_per_frame':
+                         round((switches - self.switches) / frames, 2)}
+            self.wakes = 0
+            self.late = 0
+            self.late_max = 0
+        self.frames = 0
+        self.gap_sum = 0.0
+        self.gap_sq_sum = 0.0
+        self.switches = switches
+        return stats
+
+
+task_timing = TaskTiming()
+
+###########
+
+
+class RenderBackend(ABC):
+    """
+    What seeds and stars are drawn through. disc, line and point make an
+    item and return its id, which the other calls take. An item can be given
+    a tag naming a group, so the whole group can be changed in one call. A
+    backend has to have all of them, only new_frame() and stats() are
+    optional. new_frame() is called once everything in a frame has been
+    drawn.
+    """
+
+    @abstractmethod
+    def disc(self, x, y, radius, colour, tag=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def line(self, x1, y1, x2, y2, colour, tag=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def point(self, x, y, colour, tag=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def move(self, item, dx, dy):
+        raise NotImplementedError
+
+    @abstractmethod
+    def reshape_disc(self, item, x, y, radius):
+        raise NotImplementedError
+
+    @abstractmethod
+    def reshape_line(self, item, x1, y1, x2, y2):
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_colour(self, item, colour):
+        raise NotImplementedError
+
+    @abstractmethod
+    def lift(self, item, above):
+        # Restack an item to just above another
+        raise NotImplementedError
+
+    @abstractmethod
+    def retag(self, item, tag):
+        raise NotImplementedError
+
+    @abstractmethod
+    def undraw(self, item):
+        raise NotImplementedError
+
+    @abstractmethod
+    def move_group(self, tag, dx, dy):
+        raise NotImplementedError
+
+    @abstractmethod
+    def show_group(self, tag, shown):
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_group_colour(self, tag, colour):
+        raise NotImplementedError
+
+    @abstractmethod
+    def undraw_group(self, tag, items):
+        raise NotImplementedError
+
+    def new_frame(self):
+        pass
+
+    def stats(self):
+        return {}
+
+###########
+
+
+class CanvasRecycler(RenderBackend):
+    """
+    A recycling layer under the drawing of seeds and stars. Rather than Tk
+    creating a canvas item on every draw and deleting it on every undraw,
+    undrawn items are hidden and kept in a pool by kind. A draw reconfigures
+    the coords and colour of a pooled item and raises it to the top, as a new
+    item would be. Only when the pool is empty is an item created, and only
+    when it is full is one deleted.
+    Items can be given a tag, so a group of them can be changed in one go.
+    Pooled items are untagged so group changes never reach them.
+    """
+
+    def __init__(self, canvas, max_hidden):
+        self.canvas = canvas
+        self.max_hidden = max_hidden
+        self.hidden = {'oval': [], 'line': [], 'rect': []}
+        self.hidden_count = 0
+        self.kinds = {}
+        # Tk item creates, deletes and reuses since stats() was last called
+        self.creates = 0
+        self.deletes = 0
+        self.reuses = 0
+        self.frames = 0
+
+    def _item(self, kind, coords, colour, tag):
+        opts = self._colour_opts(kind, colour)
+        if tag is not None:
+            opts['tags'] = tag
+        if self.hidden[kind]:
+            item = self.hidden[kind].pop()
+            self.hidden_count -= 1
+            self.reuses += 1
+            self.canvas.coords(item, *coords)
+            self.canvas.itemconfig(item, state='normal', **opts)
+            self.canvas.tag_raise(item)
+            return item
+
+        self.creates += 1
+        if kind == 'oval':
+            item = self.canvas.create_oval(*coords, **opts)
+        elif kind == 'line':
+            item = self.canvas.create_line(*coords, **opts)
+        else:
+            item = self.canvas.create_rectangle(*coords, **opts)
+        self.kinds[item] = kind
+        return item
+
+    def _colour_opts(self, kind, colour):
+        # The options graphics.py would give each kind of item. Its Point
+        # is a 1 pixel rectangle only given an outline
+        if kind == 'oval':
+            return {'fill': colour, 'outline': colour}
+        if kind == 'line':
+            return {'fill': colour}
+        return {'outline': colour}
+
+    def disc(self, x, y, radius, colour, tag=None):
+        # A filled circle like a graphics.py Circle
+        return self._item('oval', (x - radius, y - radius,
+                                   x + radius, y + radius), colour, tag)
+
+    def line(self, x1, y1, x2, y2, colour, tag=None):
+        return self._item('line', (x1, y1, x2, y2), colour, tag)
+
+    def point(self, x, y, colour, tag=None):
+        return self._item('rect', (x, y, x + 1, y + 1), colour, tag)
+
+    def move(self, item, dx, dy):
+        self.canvas.move(item, dx, dy)
+
+    def reshape_disc(self, item, x, y, radius):
+        self.canvas.coords(item, x - radius, y - radius,
+                           x + radius, y + radius)
+
+    def reshape_line(self, item, x1, y1, x2, y2):
+        self.canvas.coords(item, x1, y1, x2, y2)
+
+    def set_colour(self, item, colour):
+        self.canvas.itemconfig(
+            item, **self._colour_opts(self.kinds[item], colour))
+
+    def lift(self, item, above):
+        # Restack an item to just above another
+        self.canvas.tag_raise(item, above)
+
+    def retag(self, item, tag):
+        # Move an item into another group
+        self.canvas.itemconfig(item, tags=tag)
+
+    def undraw(self, item):
+        # Hide the item for reuse, or delete it if enough are hidden already
+        if self.hidden_count < self.max_hidden:
+            self.canvas.itemconfig(item, state='hidden', tags='')
+            self.hidden[self.kinds[item]].append(item)
+            self.hidden_count += 1
+        else:
+            self.canvas.delete(item)
+            del self.kinds[item]
+            self.deletes += 1
+
+    def move_group(self, tag, dx, dy):
+        self.canvas.move(tag, dx, dy)
+
+    def show_group(self, tag, shown):
+        # Hide or show the group without giving its items up
+        self.canvas.itemconfig(tag, state='normal' if shown else 'hidden')
+
+    def set_group_colour(self, tag, colour):
+        # Recolour a group of discs
+        self.canvas.itemconfig(tag, fill=colour, outline=colour)
+
+    def undraw_group(self, tag, items):
+        # Undraw all the items of a group. They are pooled if they all fit,
+        # otherwise they are all deleted
+        if self.hidden_count + len(items) <= self.max_hidden:
+            self.canvas.itemconfig(tag, state='hidden', tags='')
+            for item in items:
+                self.hidden[self.kinds[item]].append(item)
+            self.hidden_count += len(items)
+        else:
+            self.canvas.delete(tag)
+            for item in items:
+                del self.kinds[item]
+            self.deletes += len(items)
+
+    def new_frame(self):
+        self.frames += 1
+
+    def stats(self):
+        # Tk creates, deletes and reuses per frame since the last call
+        frames = max(self.frames, 1)
+        stats = {'items': len(self.kinds), 'hidden': self.hidden_count,
+                 'creates_per_frame': round(self.creates / frames, 2),
+                 'deletes_per_frame': round(self.deletes / frames, 2),
+                 'reuses_per_frame': round(self.reuses / frames, 2)}
+        self.creates = 0
+        self.deletes = 0
+        self.reuses = 0
+        self.frames = 0
+        return stats
+
+###########
+
+
+class RasterCanvas(RenderBackend):
+    """
+    A stand in for the CanvasRecycler that draws into a numpy RGB frame
+    buffer instead of making canvas items. Its items are just rows of
+    arrays. new_frame() renders the lot, discs as filled circles and lines
+    as runs of pixels, in drawing order, and puts the frame on the window as
+    a single image. So the Tk calls per frame stay the same however many
+    seeds and stars there are.
+    Without a window the frame is just left in frame, for rendering offline.
+    Item ids are rows, which are reused once an item is undrawn.
+    """
+    kinds = {'oval': 0, 'line': 1, 'rect': 2}
+
+    def __init__(self, width, height, background, win=None, capacity=4096):
+        self.win = win
+        self.width = width
+        self.height = height
+        self.colours = {}
+        self.frame = np.zeros((height, width, 3), dtype=np.uint8)
+        # Copying a blank frame is far quicker than filling with a colour
+        self.blank = np.empty_like(self.frame)
+        self.blank[:] = self._rgb(background)
+        self.ppm_header = f"P6 {width} {height} 255\n".encode()
+        self.photo = None
+        if win is not None:
+            self.photo = tk.PhotoImage(master=win, width=width, height=height)
+            # Keep the image under anything else drawn on the window
+            self.image = win.create_image(0, 0, image=self.photo,
+                                          anchor='nw')
+            win.tag_lower(self.image)
+
+        self.kind = np.zeros(capacity, dtype=np.int8)
+        self.coords = np.zeros((capacity, 4))
+        self.rgb = np.zeros((capacity, 3), dtype=np.uint8)
+        # Drawing order, higher is on top
+        self.z = np.zeros(capacity)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.shown = np.zeros(capacity, dtype=bool)
+        self.free = list(range(capacity - 1, -1, -1))
+        self.top = 0.0
+        self.tags = {}
+        self.item_tags = {}
+        self.render_time = 0
+        self.frames = 0
+
+    def _rgb(self, colour):
+        # Tk colour name or #rrggbb to an RGB triple
+        rgb = self.colours.get(colour)
+        if rgb is None:
+            if self.win is not None:
+                rgb = tuple(c >> 8 for c in self.win.winfo_rgb(colour))
+            elif colour.startswith('#'):
+                rgb = tuple(int(colour[i:i + 2], 16) for i in (1, 3, 5))
+            else:
+                rgb = colour_names[colour]
+            self.colours[colour] = rgb
+        return rgb
+
+    def _grow(self):
+        capacity = len(self.z)
+        for name in ('kind', 'coords', 'rgb', 'z', 'alive', 'shown'):
+            a = getattr(self, name)
+            setattr(self, name, np.concatenate((a, np.zeros_like(a))))
+        self.free.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+    def _item(self, kind, coords, colour, tag):
+        if not self.free:
+            self._grow()
+        item = self.free.pop()
+        self.kind[item] = self.kinds[kind]
+        self.coords[item] = coords
+        self.rgb[item] = self._rgb(colour)
+        self.z[item] = self.top
+        self.top += 1
+        self.alive[item] = True
+        self.shown[item] = True
+        if tag is not None:
+            self.retag(item, tag)
+        return item
+
+    def disc(self, x, y, radius, colour, tag=None):
+        return self._item('oval', (x - radius, y - radius,
+                                   x + radius, y + radius), colour, tag)
+
+    def line(self, x1, y1, x2, y2, colour, tag=None):
+        return self._item('line', (x1, y1, x2, y2), colour, tag)
+
+    def point(self, x, y, colour, tag=None):
+        return self._item('rect', (x, y, x + 1, y + 1), colour, tag)
+
+    def move(self, item, dx, dy):
+        self.coords[item] += (dx, dy, dx, dy)
+
+    def reshape_disc(self, item, x, y, radius):
+        self.coords[item] = (x - radius, y - radius, x + radius, y + radius)
+
+    def reshape_line(self, item, x1, y1, x2, y2):
+        self.coords[item] = (x1, y1, x2, y2)
+
+    def set_colour(self, item, colour):
+        self.rgb[item] = self._rgb(colour)
+
+    def lift(self, item, above):
+        # Put the item between above and whatever is next up from it
+        z = self.z[above]
+        self.alive[item] = False
+        higher = self.z[self.alive & (self.z > z)]
+        self.alive[item] = True
+        if higher.size:
+            self.z[item] = (z + higher.min()) / 2
+        else:
+            self.z[item] = self.top
+            self.top += 1
+
+    def retag(self, item, tag):
+        old = self.item_tags.pop(item, None)
+        if old is not None:
+            self.tags[old].discard(item)
+        if tag:
+            self.tags.setdefault(tag, set()).add(item)
+            self.item_tags[item] = tag
+
+    def undraw(self, item):
+        self.retag(item, None)
+        self.alive[item] = False
+        self.free.append(item)
+
+    def _group(self, tag):
+        return np.fromiter(self.tags.get(tag, ()), dtype=np.intp)
+
+    def move_group(self, tag, dx, dy):
+        self.coords[self._group(tag)] += (dx, dy, dx, dy)
+
+    def show_group(self, tag, shown):
+        self.shown[self._group(tag)] = shown
+
+    def set_group_colour(self, tag, colour):
+        self.rgb[self._group(tag)] = self._rgb(colour)
+
+    def undraw_group(self, tag, items):
+        for item in self.tags.pop(tag, ()):
+            del self.item_tags[item]
+            self.alive[item] = False
+            self.free.append(item)
+
+    def _discs(self, ids):
+        # The pixels of each disc whose centres are inside its outline,
+        # done a batch of discs of the same bounding square at a time
+        x1, y1, x2, y2 = self.coords[ids].T
+        cx = (x1 + x2) / 2
+        cy = (y1 + y2) / 2
+        reach = (x2 - x1) / 2 + 0.5
+        span = np.ceil(reach).astype(int)
+        for r in np.unique(span).tolist():
+            batch = span == r
+            off = np.arange(-r, r + 1)
+            px = np.floor(cx[batch])[:, None, None] + off[None, None, :]
+            py = np.floor(cy[batch])[:, None, None] + off[None, :, None]
+            inside = ((px + 0.5 - cx[batch][:, None, None]) ** 2 +
+                      (py + 0.5 - cy[batch][:, None, None]) ** 2 <=
+                      reach[batch][:, None, None] ** 2)
+            px, py, owner = np.broadcast_arrays(
+                px, py, ids[batch][:, None, None])
+            yield px[inside], py[inside], owner[inside]
+
+    def _lines(self, ids):
+        # Each line as evenly spaced pixels from one end up to the other,
+        # which like Tk is left off, done a batch of lines of about the same
+        # length at a time. The ends are snapped to pixels first, so a line
+        # one pixel long is one pixel wherever it starts
+        x1, y1, x2, y2 = np.floor(self.coords[ids]).T
+        # A pixel per step along the longer axis, at least the one
+        steps = np.maximum(np.maximum(np.abs(x2 - x1), np.abs(y2 - y1)), 1)
+        sizes = 2 ** np.ceil(np.log2(steps)).astype(int)
+        for n in np.unique(sizes).tolist():
+            batch = sizes == n
+            k = np.arange(n)[None, :]
+            used = k < steps[batch][:, None]
+            t = k / steps[batch][:, None]
+            px = x1[batch][:, None] + np.round((x2 - x1)[batch][:, None] * t)
+            py = y1[batch][:, None] + np.round((y2 - y1)[batch][:, None] * t)
+            owner = np.broadcast_to(ids[batch][:, None], px.shape)
+            yield px[used], py[used], owner[used]
+
+    def _points(self, ids):
+        x1, y1 = self.coords[ids, 0], self.coords[ids, 1]
+        yield np.floor(x1), np.floor(y1), ids
+
+    def _render(self):
+        frame = self.frame
+        np.copyto(frame, self.blank)
+        live = np.flatnonzero(self.alive & self.shown)
+        if not live.size:
+            return
+        rank = np.zeros(len(self.z), dtype=np.intp)
+        rank[live[np.argsort(self.z[live], kind='stable')]] = \
+            np.arange(live.size)
+        kind = self.kind[live]
+        pixels = []
+        owners = []
+        for code, splat in ((0, self._discs), (1, self._lines),
+                            (2, self._points)):
+            ids = live[kind == code]
+            if not ids.size:
+                continue
+            for px, py, owner in splat(ids):
+                on = ((px >= 0) & (px < self.width) &
+                      (py >= 0) & (py < self.height))
+                pixels.append(py[on].astype(np.intp) * self.width +
+                              px[on].astype(np.intp))
+                owners.append(owner[on])
+        pixels = np.concatenate(pixels)
+        owners = np.concatenate(owners)
+        # Items later in the drawing order are drawn over earlier ones, so
+        # each pixel takes the colour of the last item in order to cover it
+        order = np.argsort(rank[owners], kind='stable')[::-1]
+        pixels, first = np.unique(pixels[order], return_index=True)
+        frame.reshape(-1, 3)[pixels] = self.rgb[owners[order][first]]
+
+    def new_frame(self):
+        # Render the frame and put it on the window
+        start = time.time()
+        self._render()
+        if self.photo is not None:
+            self.photo.configure(
+                data=self.ppm_header + self.frame.tobytes(), format='PPM')
+        self.render_time += time.time() - start
+        self.frames += 1
+
+    def stats(self):
+        # Items drawn and render time per frame since the last call
+        frames = max(self.frames, 1)
+        stats = {'items': int(self.alive.sum()),
+                 'render_ms_per_frame':
+                     round(self.render_time * 1000 / frames, 2)}
+        self.render_time = 0
+        self.frames = 0
+        return stats
+
+###########
+
+
+class GraphicsBackend(RenderBackend):
+    """
+    Draws with graphics.py objects, the way seeds and stars first were, so
+    every draw creates a canvas item and every undraw deletes one. The ids
+    are the graphics objects themselves.
+    """
+
+    def __init__(self, win):
+        self.win = win
+        self.tags = {}
+        self.item_tags = {}
+        # Items created since stats() was last called
+        self.creates = 0
+        self.frames = 0
+
+    def _draw(self, obj, tag):
+        obj.draw(self.win)
+        self.creates += 1
+        if tag is not None:
+            self.retag(obj, tag)
+        return obj
+
+    def disc(self, x, y, radius, colour, tag=None):
+        obj = Circle(Point(x, y), radius)
+        obj.setFill(colour)
+        obj.setOutline(colour)
+        return self._draw(obj, tag)
+
+    def line(self, x1, y1, x2, y2, colour, tag=None):
+        obj = Line(Point(x1, y1), Point(x2, y2))
+        obj.setFill(colour)
+        return self._draw(obj, tag)
+
+    def point(self, x, y, colour, tag=None):
+        obj = Point(x, y)
+        obj.setFill(colour)
+        return self._draw(obj, tag)
+
+    def move(self, item, dx, dy):
+        item.move(dx, dy)
+
+    def reshape_disc(self, item, x, y, radius):
+        # graphics.py can't reshape a Circle, so set its box by hand
+        item.p1 = Point(x - radius, y - radius)
+        item.p2 = Point(x + radius, y + radius)
+        item.radius = radius
+        self.win.coords(item.id, x - radius, y - radius,
+                        x + radius, y + radius)
+
+    def reshape_line(self, item, x1, y1, x2, y2):
+        item.p1 = Point(x1, y1)
+        item.p2 = Point(x2, y2)
+        self.win.coords(item.id, x1, y1, x2, y2)
+
+    def set_colour(self, item, colour):
+        item.setFill(colour)
+        if isinstance(item, Circle):
+            item.setOutline(colour)
+
+    def lift(self, item, above):
+        self.win.tag_raise(item.id, above.id)
+
+    def retag(self, item, tag):
+        old = self.item_tags.pop(item, None)
+        if old is not None:
+            self.tags[old].discard(item)
+        if tag:
+            self.tags.setdefault(tag, set()).add(item)
+            self.item_tags[item] = tag
+        self.win.itemconfig(item.id, tags=tag or '')
+
+    def undraw(self, item):
+        old = self.item_tags.pop(item, None)
+        if old is not None:
+            self.tags[old].discard(item)
+        item.undraw()
+
+    def move_group(self, tag, dx, dy):
+        # Tk moves the items, the objects just need to know where they are
+        self.win.move(tag, dx, dy)
+        for obj in self.tags.get(tag, ()):
+            obj._move(dx, dy)
+
+    def show_group(self, tag, shown):
+        self.win.itemconfig(tag, state='normal' if shown else 'hidden')
+
+    def set_group_colour(self, tag, colour):
+        self.win.itemconfig(tag, fill=colour, outline=colour)
+        for obj in self.tags.get(tag, ()):
+            obj.config['fill'] = colour
+            obj.config['outline'] = colour
+
+    def undraw_group(self, tag, items):
+        self.win.delete(tag)
+        for obj in self.tags.pop(tag, ()):
+            del self.item_tags[obj]
+            obj.canvas = None
+            obj.id = None
+
+    def new_frame(self):
+        self.frames += 1
+
+    def stats(self):
+        # Items created per frame since the last call
+        stats = {'creates_per_frame':
+                 round(self.creates / max(self.frames, 1), 2)}
+        self.creates = 0
+        self.frames = 0
+        return stats
+
+###########
+
+
+class NullBackend(RenderBackend):
+    """
+    Draws nothing, just counts the calls made to it, so the time the
+    animation itself takes can be measured without any drawing.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.items = 0
+        self.frames = 0
+
+    def _count(self, call):
+        self.calls[call] = self.calls.get(call, 0) + 1
+
+    def _item(self, call):
+        self._count(call)
+        self.items += 1
+        return self.items
+
+    def disc(self, x, y, radius, colour, tag=None):
+        return self._item('disc')
+
+    def line(self, x1, y1, x2, y2, colour, tag=None):
+        return self._item('line')
+
+    def point(self, x, y, colour, tag=None):
+        return self._item('point')
+
+    def move(self, item, dx, dy):
+        self._count('move')
+
+    def reshape_disc(self, item, x, y, radius):
+        self._count('reshape_disc')
+
+    def reshape_line(self, item, x1, y1, x2, y2):
+        self._count('reshape_line')
+
+    def set_colour(self, item, colour):
+        self._count('set_colour')
+
+    def lift(self, item, above):
+        self._count('lift')
+
+    def retag(self, item, tag):
+        self._count('retag')
+
+    def undraw(self, item):
+        self._count('undraw')
+
+    def move_group(self, tag, dx, dy):
+        self._count('move_group')
+
+    def show_group(self, tag, shown):
+        self._count('show_group')
+
+    def set_group_colour(self, tag, colour):
+        self._count('set_group_colour')
+
+    def undraw_group(self, tag, items):
+        self._count('undraw_group')
+
+    def new_frame(self):
+        self.frames += 1
+
+    def stats(self):
+        # Calls of each kind per frame since the last call
+        frames = max(self.frames, 1)
+        stats = {call: round(count / frames, 2)
+                 for call, count in sorted(self.calls.items())}
+        self.calls = {}
+        self.frames = 0
+        return stats
+
+###########
+
+
 class Seed():
     """Defines the seed itself - basically a circle with fill and outline the
     same colour. Its attributes:
        How to draw it, move it, delete it
-       I don't think John Zelle's graphic.py lib will actually redraw when the
-       colour is changed, nor will it redraw an undrawn object.
+    It is drawn as a disc through a CanvasRecycler, which keeps the canvas
+    item for reuse when the seed is undrawn.
+    A Seed is only used for a seed that is being drawn. Its position and
+    flight are kept with the rest of its seedhead's seeds in a SeedBatch.
+    Seeds come from and go back to seed_pool rather than being made afresh.
     """
-    global winWdth
-    global winHt
-    global centerX
-    global centerY
+    __slots__ = ('x', 'y', 'size', 'colour', 'tag', 'canvas', 'item',
+                 'seq', 'cover', 'covered')
 
-    def __init__(self, colour='white', size='5', x=0, y=0):
-        # The cart coords of the pos of the seedhead centre on screen
+    def __init__(self, colour='white', size='5', x=0, y=0, tag=None):
+        # The cart coords of the seed on screen
         self.x = x
         self.y = y
-        # Change in position for move()
-        self.dx = 0
-        self.dy = 0
         self.size = size
-        self.radSize = 0.001  # Virtual seed radius
-        self.flgt_time = time.time()
-        # Create the basic circle obj at pos x & y on canvas
-        self.obj = Circle(Point(x, y), size)
-        #self.obj = Point(x,y)
-        self.obj.setFill(colour)
-        self.obj.setOutline(colour)
-        self.drawState = 0  # 0 = undrawn, 1 = draw, 2 = move, 3 = undraw
+        self.colour = colour
+        # The canvas tag of its seedhead
+        self.tag = tag
+        # The CanvasRecycler and canvas item while drawn
+        self.canvas = None
+        self.item = None
+        # SeedCuller state: drawing order, the seed hiding this one and the
+        # seeds this one hides
+        self.seq = 0
+        self.cover = None
+        self.covered = []
+
+    def reset(self, colour, size, x, y, tag):
+        # Reuse an undrawn seed for another seed
+        self.x = x
+        self.y = y
+        self.size = size
+        self.colour = colour
+        self.tag = tag
+        self.seq = 0
 
     def set_colour(self, colour):
-        self.obj.setFill(colour)
-        self.obj.setOutline(colour)
+        self.colour = colour
+        if self.item is not None:
+            self.canvas.set_colour(self.item, colour)
 
-    def move(self):
-        self.obj.move(self.dx, self.dy)
+    def move(self, dx, dy):
+        self.x += dx
+        self.y += dy
+        if self.item is not None:
+            self.canvas.move(self.item, dx, dy)
 
     def draw(self, gwin):
-        self.obj.draw(gwin)
+        self.canvas = gwin
+        self.item = gwin.disc(self.x, self.y, self.size, self.colour,
+                              self.tag)
 
     def undraw(self):
-        self.obj.undraw()
-
-    def motion(self, flight_speed):
-        # Calc how long the seed has flown since last update
-        flight_period = (time.time() - self.flgt_time)
-        flight_period *= flight_speed
-        self.flgt_time = time.time()
-        delta = self.radSize * flight_period
-        self.radSize += flight_period
+        if self.item is not None:
+            self.canvas.undraw(self.item)
+            self.canvas = None
+            self.item = None
+
+    def take_over(self, seed):
+        # Take over the canvas item of a seed being undrawn, reshaped to fit
+        # this seed
+        self.canvas, self.item = seed.canvas, seed.item
+        seed.canvas, seed.item = None, None
+        if (seed.x, seed.y, seed.size) != (self.x, self.y, self.size):
+            self.canvas.reshape_disc(self.item, self.x, self.y, self.size)
+        if seed.tag != self.tag:
+            self.canvas.retag(self.item, self.tag)
+
+    def lift_to(self, seed):
+        # Restack this seed's canvas item to just above another seed's
+        self.canvas.lift(self.item, seed.item)
+
+###########
+
+
+class SeedPool():
+    """
+    A free list of undrawn Seeds kept for reuse across seedhead lifetimes
+    instead of making new ones for every seed drawn.
+    """
+
+    def __init__(self, max_free):
+        self.max_free = max_free
+        self.free = []
+        self.in_use = 0
+        self.made = 0
+        self.reused = 0
+        self.lock = threading.Lock()
+
+    def get(self, colour, size, x, y, tag):
+        seed = None
+        with self.lock:
+            if self.free:
+                seed = self.free.pop()
+                self.reused += 1
+            else:
+                self.made += 1
+            self.in_use += 1
+        if seed is None:
+            return Seed(colour, size, x, y, tag)
+        seed.reset(colour, size, x, y, tag)
+        return seed
+
+    def put(self, seed):
+        # Take back an undrawn seed
+        with self.lock:
+            self.in_use -= 1
+            if len(self.free) < self.max_free:
+                self.free.append(seed)
+
+    def stats(self):
+        with self.lock:
+            return {'in_use': self.in_use, 'free': len(self.free),
+                    'made': self.made, 'reused': self.reused}
+
+
+seed_pool = SeedPool(seed_pool_size)
+
+###########
+
+
+class SeedBatch():
+    """
+    All the seeds of a seedhead held as arrays with an entry per seed,
+    rather than as an object per seed. Entries are filled in the order the
+    seeds are revealed and count says how many are in use. Drawn seeds have
+    their Seed in objs. The flight arrays can be given, eg a FlightSim slot
+    in shared memory.
+    """
+    global centerX
+    global centerY
+    start_size = 0.001
+    names = ('x', 'y', 'dx', 'dy', 'radSize', 'flgt_time', 'x0', 'y0',
+             'start')
+
+    def __init__(self, capacity, arrays=None):
+        if arrays is None:
+            arrays = {name: np.zeros(capacity) for name in SeedBatch.names}
+            arrays['radSize'][:] = self.start_size
+        self.count = 0
+        # The cart coords of each seed on screen
+        self.x = arrays['x']
+        self.y = arrays['y']
+        # Change in position for move()
+        self.dx = arrays['dx']
+        self.dy = arrays['dy']
+        self.radSize = arrays['radSize']  # Virtual radius
+        self.flgt_time = arrays['flgt_time']
+        # Where and when each seed set off, for closed form flight
+        self.x0 = arrays['x0']
+        self.y0 = arrays['y0']
+        self.start = arrays['start']
+        # 0 = undrawn, 1 = draw, 2 = move, 3 = undraw, 4 = undrawn for good
+        self.drawState = np.zeros(capacity, dtype=np.int8)
+        self.objs = [None] * capacity
+
+    def add(self, x, y, start_time=None, flight_speed=0):
+        # Fill the next entry, returning its index. The seed is flown on from
+        # start_time if given. count goes up last so the main thread never
+        # sees a half filled entry
+        i = self.count
+        self.x[i] = self.x0[i] = x
+        self.y[i] = self.y0[i] = y
+        self.flgt_time[i] = self.start[i] = frame_clock.now
+        if start_time is not None:
+            self.start[i] = start_time
+            self._catch_up(i, start_time, flight_speed)
+        self.count = i + 1
+        return i
+
+    def _catch_up(self, i, start_time, flight_speed):
+        # Fly a seed added after its seedhead was made as though it had been
+        # in flight since start_time. radSize grows in step with the flight
+        # period, so its distance from the centre grows by exp of the area
+        # under radSize
+        flight_period = (frame_clock.now - start_time) * flight_speed
+        grow = math.exp(self.radSize[i] * flight_period +
+                        flight_period * flight_period / 2)
+        self.radSize[i] += flight_period
+        self.x[i] = centerX + (self.x[i] - centerX) * grow
+        self.y[i] = centerY + (self.y[i] - centerY) * grow
+
+    def motion(self, n, flight_speed, now, cx, cy, first=0):
+        # Fly seeds first to n on to frame time now in one go, away from
+        # cx, cy
+        s = slice(first, n)
+        # Calc how long each seed has flown since last update
+        flight_period = (now - self.flgt_time[s]) * flight_speed
+        self.flgt_time[s] = now
+        delta = self.radSize[s] * flight_period
+        self.radSize[s] += flight_period
         # Create delta move
-        self.dx = (self.x - centerX) * delta
-        self.dy = (self.y - centerY) * delta
+        self.dx[s] = (self.x[s] - cx) * delta
+        self.dy[s] = (self.y[s] - cy) * delta
         # Update seed screen position
-        self.x += self.dx
-        self.y += self.dy
-
-    def onscreen(self):
-        # check if star is now outside display win
-        if (0 > self.x > winWdth or 0 > self.y > winHt):
-            return False
-        return True
+        self.x[s] += self.dx[s]
+        self.y[s] += self.dy[s]
+
+    def fly_to(self, n, flight_speed, now, cx, cy, first=0):
+        # The closed form of motion(). Put seeds first to n where they are
+        # at time now, flying away from cx, cy, worked out from just where
+        # and when they set off. Nothing is carried over from the last
+        # frame, so frames can be skipped or any time replayed
+        s = slice(first, n)
+        flight_period = np.maximum(now - self.start[s], 0) * flight_speed
+        grow = np.exp(self.start_size * flight_period +
+                      flight_period * flight_period / 2)
+        self.radSize[s] = self.start_size + flight_period
+        self.flgt_time[s] = now
+        x = cx + (self.x0[s] - cx) * grow
+        y = cy + (self.y0[s] - cy) * grow
+        # Still give the change in position for move()
+        self.dx[s] = x - self.x[s]
+        self.dy[s] = y - self.y[s]
+        self.x[s] = x
+        self.y[s] = y
 
 ###########
 
@@ -210,8 +1515,14 @@ class SeedHead():
     """
     global frameTime
     global flight_period_const
+    made = 0
 
     def __init__(self, spec):
+        # The canvas tag all its seeds carry
+        SeedHead.made += 1
+        self.tag = f"seedhead{SeedHead.made}"
+        # The CanvasRecycler it was last drawn on
+        self.canvas = None
         self.seed_count = spec['seed_count']
         # The cart coords of the pos of the seedhead centre on screen
         self.x = spec['x']
@@ -221,82 +1532,188 @@ class SeedHead():
         self.scale = spec['scale']
         # The ratio to divide 360 and produce the angle increment for each seed
         self.phi = spec['phi']
+        # How the seed radius grows, a key of spiral_laws
+        self.law = spec['law']
         self.motion = spec['motion']
-        self.seed_ary = self._create_array([])
+        # How moving seeds are flown, 'step' on from the last frame or
+        # 'closed' form from when they set off
+        self.flight = spec['flight']
+        # Only seeds that stay put can be hidden by others
+        self.cull = cull_hidden_seeds and not self.motion
+        # Set once it's been changed as a group, after which it isn't culled
+        self.grouped = False
         self.flight_speed = random.random() * flight_period_const
         self.mutate = random.random() < 0.5
-
-    def _create_array(self, ary):
-        # Create a list of seeds together with their location relative to centre
-        # of seedhead
-        sml_vec = 0
-        # Create first seed obj
-        for seed in range(1, self.seed_count):
-            start = time.time()
-            draw = True
-            vector = seed * scale
-            middle = 2.0 / scale
-            # restrict the number of central seeds
-            if vector < middle:
-                sml_vec += 1
-                if sml_vec > middle:
-                    draw = False
-            if draw:
-                seed_angle = seed * 360.0 * self.phi
-                rotPerFrame = math.fmod(seed_angle, 360)
-                # Translate from polar - vector & rotPerFrame to cartesian - dx, dy
-                # Offset from seedhead coords
-                sx = self.x + \
-                    self._fix(vector * math.cos(dToRads * rotPerFrame))
-                sy = self.y + \
-                    self._fix(vector * math.sin(dToRads * rotPerFrame))
-                # create seed
-                ary.append(Seed(self.seed_colour, self.seed_size, sx, sy))
-                end = time.time()
-                frameTimer(start, end, 1)
-
-        return ary
-
-    def _fix(self, no):
-        # Maths for int nearest zero either + or -
-        int_no = 0
-        if no >= 0:
-            int_no = math.floor(no)
+        # When it went on screen, stamped by unfoldPattern, as the next head
+        # is built well before then
+        self.created = None
+        # The seed positions relative to centre come from the shared cache.
+        # Seeds are only added to the batch from them as the unfold reaches
+        # them, so the batch is in the order they were revealed
+        self.layout = layout_cache.get(
+            self.seed_count, self.phi, self.scale, self.law)
+        # Flown by the flight_sim workers if it has a slot free
+        self.flight_slot = None
+        lent = None
+        if flight_sim is not None and self.motion:
+            lent = flight_sim.lend(len(self.layout))
+        if lent is not None:
+            self.flight_slot, arrays = lent
+            weakref.finalize(self, flight_sim.give_back, self.flight_slot)
+            self.seeds = SeedBatch(len(self.layout), arrays)
         else:
-            int_no = math.ceil(no)
-        return int_no
-
-    def draw(self, gwin):
+            self.seeds = SeedBatch(len(self.layout))
+        # How many seeds the workers flew this frame, till draw() gets it
+        self.flown = None
+        self.unfold_step = 1
+        self.seed_source = None
+        # Seeds signalled to draw or undraw that draw() hasn't got to yet.
+        # A task waiting for them to be done waits on settled
+        self.pending_draw = 0
+        self.pending_undraw = 0
+        self.settled = threading.Condition()
+        # Changes to the whole head queued by the task for draw() to make,
+        # as (method, args), each dropped once it has been made
+        self.group_ops = []
+
+    def _seed_source(self, step):
+        # Generator adding each seed to the batch as it is asked for, working
+        # through the layout from the centre out (step 1) or outside in
+        # (step -1). Yields the seed's index
+        start_time = None
+        if self.motion and self.mutate:
+            # Mutated heads have had all their seeds in flight since the
+            # head started unfolding
+            start_time = self.created
+        for dx, dy in self.layout[::step]:
+            yield self.seeds.add(self.x + int(dx), self.y + int(dy),
+                                 start_time, self.flight_speed)
+
+    def draw(self, gwin, now):
         '''
         Display all seeds marked draw or move
         Delete those marked delete
+        now is the frame time from frame_clock
         '''
         global user_exit
-        for seed in self.seed_ary:
-
-            if self.motion:
-                # Make this random it changes the dynamic shape!
-                if seed.drawState == 0 and not self.mutate:
-                    seed.flgt_time = time.time()  # start flight period timer
-
-                seed.motion(self.flight_speed)
-
-            if not seed.onscreen():
-                seed.drawState = 3
-
-            if seed.drawState == 1:
+        seeds = self.seeds
+        if self.flown is not None:
+            # flight_sim has readied and flown it this frame
+            n = self.flown
+            self.flown = None
+        else:
+            n = self.readyToFly(gwin, now)
+            if self.motion and self.flight == 'closed':
+                seeds.fly_to(n, self.flight_speed, now, centerX, centerY)
+            elif self.motion:
+                seeds.motion(n, self.flight_speed, now, centerX, centerY)
+        state = seeds.drawState[:n]
+
+        if self.motion:
+            if viewport_culler.margin is not None:
+                # Seeds only ever fly away from the centre, so once out of
+                # the viewport they are done with. Retire them as though
+                # they had been folded
+                out = viewport_culler.offscreen(
+                    seeds.x[:n], seeds.y[:n], self.seed_size)
+                # Picked out and retired under the lock, so a seed the task
+                # signals to undraw meanwhile is counted off as undrawn
+                with self.settled:
+                    retire_ary = np.flatnonzero(
+                        out & (state > 0) & (state < 4))
+                    was = state[retire_ary]
+                    state[retire_ary] = 4
+                    self._settle(int(np.count_nonzero(was == 1)),
+                                 int(np.count_nonzero(was == 3)))
+                for i in retire_ary.tolist():
+                    seed = seeds.objs[i]
+                    if seed is not None:
+                        seed.undraw()
+                        seeds.objs[i] = None
+                        seed_pool.put(seed)
+                viewport_culler.retire(len(retire_ary))
+
+        # Pick out each group before any of them change state
+        draw_ary = np.flatnonzero(state == 1)
+        move_ary = []
+        if self.motion:
+            move_ary = np.flatnonzero(state == 2).tolist()
+        undraw_ary = np.flatnonzero(state == 3).tolist()
+
+        saved = 0
+        for i in draw_ary.tolist():
+            seed = seed_pool.get(self.seed_colour, self.seed_size,
+                                 float(seeds.x[i]), float(seeds.y[i]),
+                                 self.tag)
+            seeds.objs[i] = seed
+            if self.cull and seed_culler.hide(seed):
+                saved += 1
+            else:
                 seed.draw(gwin)
-                seed.drawState = 2
-
-            elif seed.drawState == 2:
-                seed.move()
-
-            elif seed.drawState == 3:
+                if self.cull:
+                    seed_culler.add(seed)
+            if user_exit:
+                return
+        if saved:
+            seed_culler.skipped(saved)
+        if draw_ary.size:
+            with self.settled:
+                # Any the task has signalled to undraw meanwhile stay that
+                # way, for the undraw pass
+                drawn_ary = draw_ary[state[draw_ary] == 1]
+                state[drawn_ary] = 2
+                self._settle(len(draw_ary), 0)
+
+        for i in move_ary:
+            seeds.objs[i].move(float(seeds.dx[i]), float(seeds.dy[i]))
+            if user_exit:
+                return
+
+        for i in undraw_ary:
+            # Seeds can be signalled to undraw before they were ever drawn
+            seed = seeds.objs[i]
+            if seed is not None:
+                if self.cull:
+                    seed_culler.remove(seed, gwin)
                 seed.undraw()
-                seed.drawState = 4
-
+                seeds.objs[i] = None
+                seed_pool.put(seed)
+            state[i] = 4
             if user_exit:
-                break
+                return
+        if undraw_ary:
+            with self.settled:
+                self._settle(0, len(undraw_ary))
+            if self.grouped and not ((state > 0) & (state < 4)).any():
+                # Folded away, so the culler can stop leaving it be
+                self._forget_group()
+
+    def readyToFly(self, gwin, now):
+        # The start of each draw(), or of the frame if flight_sim flies it.
+        # Makes the queued group changes and starts the flight timers of
+        # seeds yet to be drawn, returning how many seeds are to be flown on
+        # to now
+        self.canvas = gwin
+        if self.group_ops:
+            self._apply_group_ops()
+        seeds = self.seeds
+        n = seeds.count
+        # Make this random it changes the dynamic shape!
+        if self.motion and not self.mutate:
+            # start flight period timer
+            unstarted = seeds.drawState[:n] == 0
+            seeds.flgt_time[:n][unstarted] = now
+            seeds.start[:n][unstarted] = now
+        return n
+
+    def _settle(self, drawn, undrawn):
+        # Count off seeds draw() has drawn and undrawn, waking the task once
+        # none are left pending. Called holding settled
+        self.pending_draw -= drawn
+        self.pending_undraw -= undrawn
+        if ((drawn and self.pending_draw == 0) or
+                (undrawn and self.pending_undraw == 0)):
+            self.settled.notify_all()
 
     def unfoldPattern(self, direction, speed):
         '''
@@ -306,36 +1723,132 @@ class SeedHead():
         global frameTime
         self.drawState = 0  # 0 = undrawn, 1 = draw, 2 = move, 3 = undraw
 
-        step = -1
+        self.unfold_step = -1
         if direction:
-            step = 1
-
-        for seed in self.seed_ary[::step]:
-            if seed.drawState == 0:
-                seed.drawState = 1
-                time.sleep(frameTime * speed)
+            self.unfold_step = 1
+
+        # Seeds are pulled from the source as the reveal gets to them
+        self.created = frame_clock.now
+        state = self.seeds.drawState
+        self.seed_source = self._seed_source(self.unfold_step)
+        while True:
+            # Added under the lock, so a moveAll() can't miss the seed
+            with self.settled:
+                i = next(self.seed_source, None)
+                if i is None:
+                    break
+                self.pending_draw += 1
+                state[i] = 1
+            yield frameTime * speed
             if user_exit:
                 break
 
         # Wait for all seeds to be drawn or off screen
-        wait_sync = True
-        while wait_sync and not user_exit:
-            wait_sync = False
-            for seed in self.seed_ary:
-                if seed.drawState == 1:
-                    wait_sync = True
-
-            time.sleep(frameTime)
+        yield Until(lambda: self.pending_draw == 0, self.settled)
+
+    def _drawn(self):
+        seeds = self.seeds
+        return [seed for seed in seeds.objs[:seeds.count] if seed is not None]
+
+    def _uncull(self):
+        # A group change would leave wrong any seed hidden under or after
+        # this head, so first have them all drawn and stop culling the head
+        if self.cull and not self.grouped:
+            self.grouped = True
+            seed_culler.release(self.tag, self.canvas)
+
+    def _forget_group(self):
+        self.grouped = False
+        seed_culler.forget(self.tag)
+
+    def _group_op(self, method, *args):
+        # Queue a change to the whole head. The canvas and the culler are
+        # the main thread's, so draw() makes it at the start of next frame
+        with self.settled:
+            self.group_ops.append((method, args))
+
+    def _apply_group_ops(self):
+        # Make the queued changes, each one call on the head's tag, then
+        # wake any task waiting for them to be made
+        with self.settled:
+            ops = list(self.group_ops)
+        for method, args in ops:
+            method(*args)
+        with self.settled:
+            del self.group_ops[:len(ops)]
+            self.settled.notify_all()
 
     def undrawAll(self, speed):
-        # undraw all drawn seeds
-        global user_exit
-        for seed in self.seed_ary:
-            if seed.drawState > 0:
-                seed.undraw()
-                seed.drawState = 0
-            if user_exit:
-                break
+        # undraw all drawn seeds, all their items going in one Tk call,
+        # waiting for draw() to have made it
+        self._group_op(self._undraw_all)
+        yield Until(lambda: not self.group_ops, self.settled)
+
+    def moveAll(self, dx, dy):
+        # Move the whole head, seeds still to come included, next frame
+        self._group_op(self._move_all, dx, dy)
+
+    def showAll(self, shown):
+        # Hide or show the seeds drawn so far, next frame
+        self._group_op(self._show_all, shown)
+
+    def colourAll(self, colour):
+        # Change the colour of the whole head, seeds still to come
+        # included, next frame
+        self._group_op(self._colour_all, colour)
+
+    def _undraw_all(self):
+        seeds = self.seeds
+        drawn = self._drawn()
+        if self.cull:
+            # Any seeds of other heads it hides are drawn on its canvas
+            seed_culler.remove_all(drawn, self.canvas)
+        items = [seed.item for seed in drawn if seed.item is not None]
+        if items:
+            self.canvas.undraw_group(self.tag, items)
+        for seed in drawn:
+            seed.canvas = None
+            seed.item = None
+            seed_pool.put(seed)
+        with self.settled:
+            n = seeds.count
+            seeds.objs[:n] = [None] * n
+            seeds.drawState[:n] = 0
+            self.pending_draw = 0
+            self.pending_undraw = 0
+        if self.grouped:
+            self._forget_group()
+
+    def _move_all(self, dx, dy):
+        self._uncull()
+        seeds = self.seeds
+        with self.settled:
+            # Seeds the task adds from now on go by the new centre
+            n = seeds.count
+            self.x += dx
+            self.y += dy
+            for a, d in ((seeds.x, dx), (seeds.y, dy),
+                         (seeds.x0, dx), (seeds.y0, dy)):
+                a[:n] += d
+        if self.cull:
+            # Keep the hash up to date
+            seed_culler.shift(self._drawn(), dx, dy)
+        else:
+            for seed in self._drawn():
+                seed.x += dx
+                seed.y += dy
+        self.canvas.move_group(self.tag, dx, dy)
+
+    def _show_all(self, shown):
+        self._uncull()
+        self.canvas.show_group(self.tag, shown)
+
+    def _colour_all(self, colour):
+        self._uncull()
+        self.seed_colour = colour
+        for seed in self._drawn():
+            seed.colour = colour
+        self.canvas.set_group_colour(self.tag, colour)
 
     def undraw(self):
         pass
@@ -344,73 +1857,533 @@ class SeedHead():
         # signal undraw all drawn seeds in a timed sequence
         global user_exit
         global frameTime
-        step = -1
+        # Stop any seeds not revealed yet from being added
+        if self.seed_source is not None:
+            self.seed_source.close()
+
+        # The batch is in the order the seeds were revealed, so allow for the
+        # unfold direction to keep the fold direction the same
+        step = -self.unfold_step
         if direction:
-            step = 1
+            step = self.unfold_step
 
-        for seed in self.seed_ary[::step]:
+        n = self.seeds.count
+        state = self.seeds.drawState
+        for i in range(n)[::step]:
             # signal remove drawn or moved seeds
-            if seed.drawState == 0:
-                seed.drawState = 4
-            elif seed.drawState < 3:
-                seed.drawState = 3
-                time.sleep(frameTime * speed)
+            if state[i] == 0:
+                state[i] = 4
+            elif state[i] < 3:
+                with self.settled:
+                    self.pending_undraw += 1
+                    state[i] = 3
+                yield frameTime * speed
             if user_exit:
                 break
 
         # Wait for seeds to be all undrawn
-        wait_sync = True
-        #wait_ctr = 0
-        #seed_error = 4
-        while wait_sync and not user_exit:
-            wait_sync = False
-            for seed in self.seed_ary:
-                if seed.drawState != 4:
-                    #seed_error = seed.drawState
-                    wait_sync = True
-            #wait_ctr += 1
-            time.sleep(frameTime)
-        # return(wait_ctr, seed_error)
+        yield Until(lambda: self.pending_undraw == 0, self.settled)
+
+###########
+
+
+class LayoutCache():
+    '''
+    A process wide cache of seedhead layouts, ie seed offsets relative to the
+    head centre, shared by all the seedhead tasks. The layout for fewer seeds
+    is just the start of the layout for more, so layouts are keyed by
+    (phi, scale, law) and only the biggest one worked out is kept, along with
+    its seed numbers to cut it short at any seed_count. The least recently
+    used is dropped when the cache is full. The hit and miss counts show how
+    much layout work is being skipped.
+    '''
+
+    def __init__(self, max_layouts):
+        self.max_layouts = max_layouts
+        self.layouts = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # An optional LayoutStore to try before calculating a layout
+        self.store = None
+        self.store_hits = 0
+
+    def get(self, seed_count, phi, scale, law):
+        key = (phi, scale, law)
+        with self.lock:
+            entry = self.layouts.get(key)
+            if entry is not None and entry[0] >= seed_count:
+                self.layouts.move_to_end(key)
+                self.hits += 1
+                return self._cut(entry, seed_count)
+            self.misses += 1
+
+        # Calculate outside the lock so other tasks aren't held up.
+        # Layouts are shared so make sure nobody can change one
+        entry = None
+        if self.store is not None:
+            entry = self.store.get(seed_count, phi, scale, law)
+        from_store = entry is not None
+        if not from_store:
+            seed, offsets = seedSpiral(seed_count, phi, scale, law)
+            offsets.flags.writeable = False
+            entry = (seed_count, seed, offsets)
+        with self.lock:
+            if from_store:
+                self.store_hits += 1
+            # Another task may have worked out a bigger one meanwhile
+            cached = self.layouts.get(key)
+            if cached is None or cached[0] < entry[0]:
+                self.layouts[key] = entry
+            self.layouts.move_to_end(key)
+            while len(self.layouts) > self.max_layouts:
+                self.layouts.popitem(last=False)
+        return self._cut(entry, seed_count)
+
+    def _cut(self, entry, seed_count):
+        # The offsets of the seeds numbered below seed_count
+        max_count, seed, offsets = entry
+        return offsets[:np.searchsorted(seed, seed_count)]
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'store_hits': self.store_hits,
+                    'layouts': len(self.layouts)}
+
+
+class LayoutStore():
+    '''
+    An on disk file of precomputed seedhead layouts that later runs memory
+    map rather than recalculate. The file starts with a magic number, version
+    and a json header listing the layouts (jobs) it holds. If any of those
+    don't match, the layouts are recalculated across a process pool and the
+    file is written again.
+    '''
+    magic = b'FIBLAYT\0'
+    version = 2
+
+    def __init__(self, path, jobs):
+        self.path = path
+        self.jobs = [list(job) for job in jobs]
+        self.layouts = self._open()
+        if self.layouts is None:
+            self._build()
+            self.layouts = self._open()
+
+    def get(self, seed_count, phi, scale, law):
+        # Returns the whole layout held, as (its seed_count, seed numbers,
+        # offsets), or None if the file doesn't hold one that big
+        try:
+            max_count, rows = self.layouts[(phi, scale, law)]
+        except KeyError:
+            return None
+        if seed_count > max_count:
+            return None
+        return max_count, rows[:, 0], rows[:, 1:]
+
+    def _open(self):
+        try:
+            with open(self.path, 'rb') as f:
+                magic, version, header_len = struct.unpack('<8sII', f.read(16))
+                if magic != LayoutStore.magic or version != LayoutStore.version:
+                    return None
+                header = json.loads(f.read(header_len))
+        except (OSError, ValueError, struct.error):
+            return None
+        if header['jobs'] != self.jobs:
+            return None
+
+        try:
+            data = np.memmap(self.path, dtype='<i4', mode='r',
+                             offset=self._data_offset(header_len),
+                             shape=(header['rows'], 3))
+        except (OSError, ValueError):
+            # The file is cut short
+            return None
+        layouts = {}
+        for phi, scale, law, seed_count, start, rows in header['entries']:
+            layouts[(phi, scale, law)] = (seed_count, data[start:start + rows])
+        return layouts
+
+    def _build(self):
+        print(f"Building layout store {self.path}")
+        with ProcessPoolExecutor() as pool:
+            layouts = list(pool.map(storeLayout, self.jobs))
+
+        entries = []
+        start = 0
+        for (phi, scale, law, seed_count), rows in zip(self.jobs, layouts):
+            entries.append([phi, scale, law, seed_count, start, len(rows)])
+            start += len(rows)
+        header = json.dumps({'jobs': self.jobs, 'entries': entries,
+                             'rows': start}).encode()
+        offset = self._data_offset(len(header))
+
+        # Write to a temp file first so a half written store is never used
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(struct.pack('<8sII', LayoutStore.magic,
+                                LayoutStore.version, len(header)))
+            f.write(header)
+            f.write(bytes(offset - 16 - len(header)))
+            for rows in layouts:
+                f.write(rows.tobytes())
+        os.replace(tmp_path, self.path)
+
+    def _data_offset(self, header_len):
+        # The layout data starts on the next 64 byte boundary after the header
+        return (16 + header_len + 63) // 64 * 64
+
+
+layout_cache = LayoutCache(layout_cache_size)
+
+###########
+
+
+class SeedCuller():
+    '''
+    Saves creating canvas items for static seeds that would be completely
+    hidden. A seed is hidden when a drawn seed of the same colour covers it
+    and nothing of another colour has been drawn over it since, so the screen
+    looks exactly the same without it.
+    Drawn static seeds of all the registered heads are kept in a spatial hash,
+    a dict of cell_size pixel square cells each listing the seeds drawn in it.
+    When a seed that is hiding others is undrawn, one of them takes over its
+    canvas item so nothing underneath shows through.
+    Moving seeds are left out, they fly over everything anyway.
+    '''
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.max_size = 0
+        self.seq = 0
+        self.hidden = 0  # Seeds currently drawn without a canvas item
+        self.frame_saved = 0  # Canvas items not created this frame
+        self.saved = 0
+        self.frames = 0
+        # The tags of heads being changed as a group, which aren't culled
+        self.released = set()
+
+    def _cell(self, x, y):
+        return (int(x // self.cell_size), int(y // self.cell_size))
+
+    def _near(self, seed, reach):
+        # The drawn seeds in cells within reach of a seed, latest drawn first
+        x0, y0 = self._cell(seed.x - reach, seed.y - reach)
+        x1, y1 = self._cell(seed.x + reach, seed.y + reach)
+        near = []
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                near.extend(self.cells.get((cx, cy), ()))
+        near.sort(key=lambda s: s.seq, reverse=True)
+        return near
+
+    def hide(self, seed):
+        # Returns True if the seed would be hidden so needn't be drawn.
+        # Work down through the seeds it overlaps from the top. Tk draws the
+        # outline on top of the radius, so allow a pixel for it either way
+        if seed.tag in self.released:
+            return False
+        for other in self._near(seed, seed.size + self.max_size + 1):
+            dist = math.hypot(other.x - seed.x, other.y - seed.y)
+            if dist > seed.size + other.size + 1:
+                continue
+            if other.colour != seed.colour or other.tag in self.released:
+                return False
+            if self._covers(other, seed, dist):
+                # It goes in the drawing order as though it had been drawn
+                self.seq += 1
+                seed.seq = self.seq
+                seed.cover = other
+                other.covered.append(seed)
+                self.hidden += 1
+                return True
+        return False
+
+    def _covers(self, cover, seed, dist):
+        # Whether the disc of cover, dist away, hides all of seed's
+        return (dist == 0 and seed.size <= cover.size) or \
+            dist + seed.size + 1 <= cover.size
+
+    def skipped(self, count):
+        # draw() created no items for count hidden seeds
+        self.frame_saved += count
+
+    def add(self, seed):
+        # Add a seed that has just been drawn
+        self.seq += 1
+        seed.seq = self.seq
+        self._insert(seed)
+
+    def _insert(self, seed):
+        self.cells.setdefault(self._cell(seed.x, seed.y), []).append(seed)
+        self.max_size = max(self.max_size, seed.size)
+
+    def _uncell(self, seed):
+        key = self._cell(seed.x, seed.y)
+        cell = self.cells.get(key, [])
+        if seed in cell:
+            cell.remove(seed)
+            if not cell:
+                del self.cells[key]
+
+    def remove(self, seed, gwin):
+        # Remove a seed that is being undrawn
+        if seed.cover is not None:
+            # It was hidden so there's no item to remove
+            seed.cover.covered.remove(seed)
+            seed.cover = None
+            self.hidden -= 1
+            return
+
+        self._uncell(seed)
+        self._hand_on(seed, gwin)
+
+    def remove_all(self, seeds, gwin):
+        # Remove a whole head's seeds being undrawn together. Only seeds of
+        # other heads are handed items or drawn. They are all taken out of
+        # the hash first so none of them can be picked to hide another
+        going = set(seeds)
+        for seed in seeds:
+            if seed.cover is None:
+                self._uncell(seed)
+        for seed in seeds:
+            if seed.cover is not None:
+                if seed.cover not in going:
+                    seed.cover.covered.remove(seed)
+                seed.cover = None
+                self.hidden -= 1
+            else:
+                seed.covered = [s for s in seed.covered if s not in going]
+                self._hand_on(seed, gwin)
+
+    def release(self, tag, gwin):
+        # Stop culling the seeds of the head with the tag, as it is about to
+        # be changed as a group. Its hidden seeds are drawn, as are any other
+        # hidden seeds drawn after one of its seeds they overlap, just above
+        # the last seed drawn before them. Its seeds stay in the hash, but
+        # only to stop the seeds under them being hidden
+        self.released.add(tag)
+        hidden = [h for cell in self.cells.values() for s in cell
+                  for h in s.covered]
+        show = [h for h in hidden if h.tag == tag or
+                any(o.tag == tag for o in self._under(h))]
+        show.sort(key=lambda h: h.seq)
+        for seed in show:
+            seed.cover.covered.remove(seed)
+            seed.cover = None
+            self.hidden -= 1
+            seed.draw(gwin)
+            seed.lift_to(self._under(seed)[0])
+            self._insert(seed)
+
+    def _under(self, seed):
+        # The drawn seeds a seed overlaps that were drawn before it, latest
+        # drawn first
+        return [o for o in self._near(seed, seed.size + self.max_size + 1)
+                if o.seq < seed.seq and math.hypot(o.x - seed.x, o.y - seed.y)
+                <= seed.size + o.size + 1]
+
+    def forget(self, tag):
+        # The released head with the tag is all undrawn
+        self.released.discard(tag)
+
+    def shift(self, seeds, dx, dy):
+        # Move drawn seeds of a released head
+        for seed in seeds:
+            self._uncell(seed)
+            seed.x += dx
+            seed.y += dy
+            self._insert(seed)
+
+    def _hand_on(self, seed, gwin):
+        # Pass on the item of a seed going to the seeds it was hiding
+        if seed.covered:
+            # Hand the item to the first hidden seed. It keeps the same place
+            # in the drawing order so still looks the same
+            covered = seed.covered
+            seed.covered = []
+            heir = covered[0]
+            heir.cover = None
+            self.hidden -= 1
+            heir.take_over(seed)
+            heir.seq = seed.seq
+            self._insert(heir)
+            # The rest stay hidden if the heir covers them too, which is all
+            # that needs checking as it takes the old item's place. If not
+            # they are drawn in the same place in the drawing order as it
+            for other in covered[1:]:
+                dist = math.hypot(heir.x - other.x, heir.y - other.y)
+                if self._covers(heir, other, dist):
+                    other.cover = heir
+                    heir.covered.append(other)
+                    continue
+                other.cover = None
+                self.hidden -= 1
+                other.draw(gwin)
+                other.lift_to(heir)
+                other.seq = heir.seq
+                self._insert(other)
+
+    def new_frame(self):
+        self.saved += self.frame_saved
+        self.frames += 1
+        self.frame_saved = 0
+
+    def stats(self):
+        # Canvas items saved per frame since the last call
+        saved_per_frame = self.saved / max(self.frames, 1)
+        self.saved = 0
+        self.frames = 0
+        return {'hidden': self.hidden,
+                'saved_per_frame': round(saved_per_frame, 2)}
+
+
+seed_culler = SeedCuller(cull_cell_size)
+
+###########
+
+
+class ViewportCuller():
+    '''
+    Finds moving seeds that have flown out of the window. A seed is off
+    screen once its whole disc is more than margin pixels past an edge.
+    main() sets the bounds to the size of the window actually on screen.
+    '''
+    global winWdth
+    global winHt
+
+    def __init__(self, margin):
+        self.margin = margin
+        self.width = winWdth
+        self.height = winHt
+        self.frame_culled = 0  # Seeds retired this frame
+        self.culled = 0
+        self.frames = 0
+
+    def set_bounds(self, width, height):
+        self.width = width
+        self.height = height
+
+    def offscreen(self, x, y, size):
+        # Returns a mask of which of the seeds at x, y are off screen
+        reach = self.margin + size
+        return ((x < -reach) | (x > self.width + reach) |
+                (y < -reach) | (y > self.height + reach))
+
+    def retire(self, count):
+        self.frame_culled += count
+
+    def new_frame(self):
+        self.culled += self.frame_culled
+        self.frames += 1
+        self.frame_culled = 0
+
+    def stats(self):
+        # Seeds retired per frame since the last call
+        culled_per_frame = self.culled / max(self.frames, 1)
+        self.culled = 0
+        self.frames = 0
+        return {'culled_per_frame': round(culled_per_frame, 2)}
+
+
+viewport_culler = ViewportCuller(offscreen_margin)
 
 ########################################
 
 
-class SeedHeadTask1(threading.Thread):
+class Until():
     '''
-    The basic fibonacci seedhead thread
+    Yielded by a task's steps to wait until predicate() holds. wakeup is
+    the Condition notified, or the Event, a thread's or a process's, set
+    when it might. A thread blocks on that, a coroutine just looks again
+    each frame.
+    '''
+
+    def __init__(self, predicate, wakeup):
+        self.predicate = predicate
+        self.wakeup = wakeup
+
+    def wait(self):
+        if hasattr(self.wakeup, 'is_set'):
+            task_clock.wait_event(self.wakeup)
+        else:
+            task_clock.wait_for(self.wakeup, self.predicate)
+# .........................
+
+
+class SteppedTask(threading.Thread, metaclass=ABCMeta):
+    '''
+    A task written as a generator of steps, steps(), which yields each wait
+    rather than waiting: seconds to sleep, or an Until. Run as a thread it
+    does the waits itself. With task_mode 'asyncio' FrameTasks runs the
+    same steps as a coroutine instead. What a task waits on elsewhere, such
+    as SeedHead.unfoldPattern() or Sequencer.taskControl(), is written as
+    steps too, for the task to yield from.
+    '''
+
+    def run(self):
+        for wait in self.steps():
+            if isinstance(wait, Until):
+                wait.wait()
+            else:
+                due = task_clock.time() + wait
+                task_clock.sleep(wait)
+                task_timing.woke(task_clock.time() - due)
+
+    @abstractmethod
+    def steps(self):
+        raise NotImplementedError
+# .........................
+
+
+class SeedHeadTask(SteppedTask):
+    '''
+    What the seedhead tasks share. Each builds its next head while the
+    current one is on screen, randomising the spec as it goes, so each
+    works from its own copy of it.
     '''
 
     def __init__(self, id, spec, delay, seedHeadFuncPointer):
         threading.Thread.__init__(self)
         self.id = id
-        self.spec = spec
+        self.spec = dict(spec)
         self.delay = delay
+        self.rand_size = self.spec['size'] == 'rand'
         self.seedHeadFunc = seedHeadFuncPointer
         # setup task controller interface
         self.seqr = Sequencer()
-        # Configure the generator sync controller
-        self.taskController = self.seqr.taskControlGen(self.id)
+# .........................
 
-    def run(self):
+
+class SeedHeadTask1(SeedHeadTask):
+    '''
+    The basic fibonacci seedhead thread
+    '''
+
+    def steps(self):
         global user_exit
-        time.sleep(self.delay)
+        yield self.delay
+        next_head = SeedHead(self.spec)
         while not user_exit:
-            seed_head = SeedHead(self.spec)
+            seed_head = next_head
             # setup drawing interface
             self.seedHeadFunc(self.id, seed_head)
-            seed_head.unfoldPattern(True, self.spec['speed'])
-            time.sleep(random.randrange(self.delay, 6))
+            yield from seed_head.unfoldPattern(True, self.spec['speed'])
+            # Build the next head while this one is on screen
+            next_head = SeedHead(self.spec)
+            yield random.randrange(self.delay, 6)
             direction = False
-            seed_head.foldPattern(direction, self.spec['speed'] * 2)
-            time.sleep(random.random() * (frameTime * self.delay * 600))
+            yield from seed_head.foldPattern(direction,
+                                             self.spec['speed'] * 2)
+            yield random.random() * (frameTime * self.delay * 600)
             del seed_head
             # Signal remove seedHead from drawing list
             self.seedHeadFunc(self.id, None)
             # Sync task to main event sequence
-            try:
-                next(self.taskController)
-            except StopIteration:
-                pass
+            yield from self.seqr.taskControl(self.id)
         try:
             del seed_head
         except NameError:
@@ -418,80 +2391,65 @@ class SeedHeadTask1(threading.Thread):
 # .........................
 
 
-class SeedHeadTask2(threading.Thread):
+class SeedHeadTask2(SeedHeadTask):
     '''
     A mutable seedhead task that uses random functions to control
     various of its attribs
     '''
 
-    def __init__(self, id, spec, delay, seedHeadFuncPointer):
-        threading.Thread.__init__(self)
-        self.id = id
-        self.spec = spec
-        self.delay = delay
-        self.rand_size = False
-        if self.spec['size'] == 'rand':
-            self.rand_size = True
-        self.seedHeadFunc = seedHeadFuncPointer
-        # setup task controller interface
-        self.seqr = Sequencer()
-        # Configure the generator sync controller
-        self.taskController = self.seqr.taskControlGen(self.id)
-
-    def run(self):
+    def steps(self):
         global user_exit
         global colours
         global head_shape_choices
         self.loop_ctr = 0
 
-        time.sleep(self.delay)
+        yield self.delay
+        next_head = self._next_head()
         while not user_exit:
 
-            args = random.choice(colours)
-            color = color_rgb(*args)
-            self.spec['colour'] = color
-
-            self.spec['motion'] = random.choice([True, False, True])
-
-            if self.rand_size:
-                self.spec['size'] = random.randrange(1, 4)
-
-            seed_head = SeedHead(self.spec)
+            seed_head = next_head
             # Setup drawing interface
             self.seedHeadFunc(self.id, seed_head)
-            seed_head.unfoldPattern(True, self.spec['speed'])
-
-            direction = random.choice([True, False, True])
-            seed_head.foldPattern(direction, self.spec['speed'])
+            yield from seed_head.unfoldPattern(True, self.spec['speed'])
 
+            # Build the next head while this one is on screen
             self.spec['phi'] = random.choice(head_shape_choices)
+            next_head = self._next_head()
+
+            direction = random.choice([True, False, True])
+            yield from seed_head.foldPattern(direction, self.spec['speed'])
 
             self.loop_ctr += 1
             # Sync task to main event sequence
-            try:
-                next(self.taskController)
-            except StopIteration:
-                pass
+            yield from self.seqr.taskControl(self.id)
             print(f"Task 2 a id = {self.id} run={self.loop_ctr}")
 
-            time.sleep(random.random() * (frameTime * self.delay * 100))
+            yield random.random() * (frameTime * self.delay * 100)
             del seed_head
             # Signal remove seedHead from drawing list
             self.seedHeadFunc(self.id, None)
-            try:
-                next(self.taskController)
-            except StopIteration:
-                pass
+            yield from self.seqr.taskControl(self.id)
             print(f"Task 2 b id = {self.id} run={self.loop_ctr}")
 
         try:
             del seed_head
         except NameError:
             pass
+
+    def _next_head(self):
+        # Randomise the spec and build the next seedhead from it
+        self.spec['colour'] = random.choice(palette.colours)
+
+        self.spec['motion'] = random.choice([True, False, True])
+
+        if self.rand_size:
+            self.spec['size'] = random.randrange(1, 4)
+
+        return SeedHead(self.spec)
 # .........................
 
 
-class SeedHeadRandPosTask3(threading.Thread):
+class SeedHeadRandPosTask3(SeedHeadTask):
     '''
     An even more mutable seedhead task that uses random functions to control
     various of its attribs including position and seed_count
@@ -500,74 +2458,49 @@ class SeedHeadRandPosTask3(threading.Thread):
     global winHt
 
     def __init__(self, id, spec, delay, seedHeadFuncPointer):
-        threading.Thread.__init__(self)
-        self.id = id
-        self.spec = spec
-        self.delay = delay
+        SeedHeadTask.__init__(self, id, spec, delay, seedHeadFuncPointer)
+        # Where the heads are scattered about, and their most seeds
         self.x = spec['x']
         self.y = spec['y']
         self.seed_count = spec['seed_count']
-        self.rand_size = False
-        if self.spec['size'] == 'rand':
-            self.rand_size = True
-        self.seedHeadFunc = seedHeadFuncPointer
-        # setup task controller interface
-        self.seqr = Sequencer()
-        # Configure the generator sync controller
-        self.taskController = self.seqr.taskControlGen(self.id)
 
-    def run(self):
+    def steps(self):
         global user_exit
         global colours
         global head_shape_choices
         self.loop_ctr = 0
 
-        time.sleep(self.delay)
+        yield self.delay
+        next_head = self._next_head()
         while not user_exit:
 
-            self.spec['seed_count'] = random.randrange(20, self.seed_count)
-            halfscnwd = (winWdth / 2) - 100
-            halfscnht = (winHt / 2) - 80
-            self.spec['x'] = self.x + \
-                random.randrange((-1 * halfscnwd), halfscnwd)
-            self.spec['y'] = self.y + \
-                random.randrange((-1 * halfscnht), halfscnht)
-            if self.rand_size:
-                self.spec['size'] = random.randrange(1, 2)
             topspeed = int(self.spec['speed'] * 100) + 10
             bspeed = topspeed - 5
             new_speed = random.randrange(bspeed, topspeed) / 100
 
-            args = random.choice(colours)
-            color = color_rgb(*args)
-
-            self.spec['colour'] = color
-            self.spec['motion'] = random.choice([True, False, True])
-
-            seed_head = SeedHead(self.spec)
+            seed_head = next_head
             direction = random.choice([True, False, True, True])
 
             # Setup drawing interface
             self.seedHeadFunc(self.id, seed_head)
 
-            seed_head.unfoldPattern(direction, new_speed)
+            yield from seed_head.unfoldPattern(direction, new_speed)
+
+            # Build the next head while this one is on screen
+            self.spec['phi'] = random.choice(head_shape_choices)
+            next_head = self._next_head()
 
             direction = random.choice([True, False, True])
             #topspeed = int(self.spec['speed'] * 100) + 10
             #bspeed = topspeed - 5
             new_speed = random.randrange(bspeed, topspeed) / 100
             # ctr, seed_state =
-            seed_head.foldPattern(direction, new_speed)
-
-            self.spec['phi'] = random.choice(head_shape_choices)
+            yield from seed_head.foldPattern(direction, new_speed)
 
             # Sync task to main event sequence
-            try:
-                next(self.taskController)
-            except StopIteration:
-                pass
+            yield from self.seqr.taskControl(self.id)
 
-            time.sleep(random.random() * (frameTime * self.delay * 100))
+            yield random.random() * (frameTime * self.delay * 100)
 
             del seed_head
             # Signal remove seedHead from drawing list
@@ -575,12 +2508,7 @@ class SeedHeadRandPosTask3(threading.Thread):
             self.loop_ctr += 1
 
             # Sync task to main event sequence
-            try:
-                next(self.taskController)
-            except StopIteration:
-                pass
-
-            # self.seqr.taskControl(self.id)
+            yield from self.seqr.taskControl(self.id)
 
             #print(f"Task 3 id = {self.id} run={self.loop_ctr}")
 
@@ -589,6 +2517,24 @@ class SeedHeadRandPosTask3(threading.Thread):
         except NameError:
             pass
 
+    def _next_head(self):
+        # Randomise the spec, including position and seed_count, and build
+        # the next seedhead from it
+        self.spec['seed_count'] = random.randrange(20, self.seed_count)
+        halfscnwd = (winWdth / 2) - 100
+        halfscnht = (winHt / 2) - 80
+        self.spec['x'] = self.x + \
+            random.randrange((-1 * halfscnwd), halfscnwd)
+        self.spec['y'] = self.y + \
+            random.randrange((-1 * halfscnht), halfscnht)
+        if self.rand_size:
+            self.spec['size'] = random.randrange(1, 2)
+
+        self.spec['colour'] = random.choice(palette.colours)
+        self.spec['motion'] = random.choice([True, False, True])
+
+        return SeedHead(self.spec)
+
 
 #######################################
 # Star Field Classes
@@ -600,104 +2546,318 @@ flight_period
 '''
 
 
-class Star():
+class StarBatch():
     '''
-    A class for creating, maintaining and killing each star
+    The stars as arrays, one entry per star, so a frame moves them all in
+    one go with numpy. Stars that leave the window are restarted through a
+    mask. The arrays can be given, eg a slice of those in shared memory.
     '''
-    global winWdth
-    global winHt
-
-    # Class variables
-    s_warp = False
-
-    def __init__(self, size, a_colour):
-        self.colour = a_colour
-        self.restart(size)
-
-    # When the star has left the window.. Restart it with this
-    def restart(self, size):
+    names = ('x', 'y', 'size', 'start_x', 'start_y', 'colour')
+
+    def __init__(self, count, rng, arrays=None):
+        if arrays is None:
+            arrays = {name: np.zeros(count) for name in StarBatch.names}
+        self.rng = rng
+        self.x = arrays['x']
+        self.y = arrays['y']
+        self.size = arrays['size']
+        # first point of each star's line
+        self.start_x = arrays['start_x']
+        self.start_y = arrays['start_y']
+        # each star's colour as an index into palette
+        self.colour = arrays['colour']
+
+    # When stars have left the window.. Restart them with this
+    def restart(self, mask, size, warp):
+        n = np.count_nonzero(mask)
+        if not n:
+            return
         # set star origin
-        self.x = random.randrange(0, winWdth)
-        self.y = random.randrange(0, winHt)
-        # get the first point of the line
-        self.start = Point(self.x, self.y)
-        self.size = random.random() * size
-        if Star.s_warp:
-            self.colour = random.choice(colours)
+        self.x[mask] = self.rng.integers(0, winWdth, n)
+        self.y[mask] = self.rng.integers(0, winHt, n)
+        self.start_x[mask] = self.x[mask]
+        self.start_y[mask] = self.y[mask]
+        self.size[mask] = self.rng.random(n) * size
+        if warp:
+            self.colour[mask] = self.rng.integers(0, len(palette.colours), n)
         else:
-            self.colour = (255, 255, 255)
-
-    def draw(self, gwin):
-        # create coords for line end
-        self.end = Point(self.x, self.y)
-
-        # Adjust star colour alpha according to size
-        star_colour = color_rgb(
-            *self._colour_scale(self.colour, min(self.size / 2, 1)))
-
-        # is it still too small for a line?
-        if self.size > 2:
-            self.starObj = Line(self.start, self.end)
-        else:
-            self.starObj = self.end
-
-        self.starObj.setFill(star_colour)
-        # self.starObj.setOutline(star_colour)
-        self.starObj.draw(gwin)
-
-        # update Point object of start of line for next draw
-        self.start = self.end.clone()
-
-    def undraw(self):
-        self.starObj.undraw()
-
-    # There is no alpha in Graphics.py. This method provides a rough equivalent
-    # to the JS r,g,b,alpha
-
-    def _colour_scale(self, colour, alpha):
-        return (tuple([math.floor(clr * alpha) for clr in colour]))
+            self.colour[mask] = palette.white
+
+    def move(self, line_length, line_length_adjust, cx, cy, warp):
+        # calc new position and size
+        # Al star paths expand in x&y at size*flight_period
+        # This assumes no star will hit us!
+        step = self.size * line_length * line_length_adjust
+        self.x += (self.x - cx) * step
+        self.y += (self.y - cy) * step
+        self.size += line_length
+        # restart the stars now outside display win
+        self.restart((self.x < 0) | (self.x > winWdth) |
+                     (self.y < 0) | (self.y > winHt), 1, warp)
 # .........................
 
 
 class StarField():
+    '''
+    Draws the stars of a StarBatch. With flight_processes set they are kept
+    in shared memory and moved by the FlightSim.
+    '''
     global user_exit
     global winWdth
     global winHt
 
     def __init__(self, star_density):
         # Keeping the number of stars about 20 as processing is slow
-        self.no_of_stars = int(winWdth * winHt / 1000 * star_density)
+        self.no_of_stars = starCount(star_density)
         self.starFieldControl = 0
         self.starFieldDrawn = False
-        self.colour = (255, 255, 255)
-        self.stars = []
-        # Build list of stars - starfield
-        for star in range(self.no_of_stars):
-            self.stars.append(Star(1, self.colour))
+        # Set each time the field has been drawn
+        self.drawn = threading.Event()
+        self.warp = False
+        # Seeded from random so an offline render's stars repeat too
+        rng = np.random.default_rng(random.getrandbits(64))
+        self.sim = None
+        arrays = None
+        if flight_sim is not None and flight_sim.stars == self.no_of_stars:
+            self.sim = flight_sim
+            arrays = self.sim.star_arrays
+        self.stars = StarBatch(self.no_of_stars, rng, arrays)
+        self.stars.restart(np.ones(self.no_of_stars, dtype=bool), 1, False)
+        # each star's own canvas item and the palette shade it was last given
+        self.starObjs = []
+        self.drawn_shades = None
+
+    def move(self, line_length, line_length_adjust):
+        # The FlightSim workers, if any, are waited for
+        if self.sim is None:
+            # All the stars in one vectorised step
+            self.stars.move(line_length, line_length_adjust,
+                            centerX, centerY, self.warp)
+            return
+        self.sim.step(line_length, line_length_adjust,
+                      centerX, centerY, self.warp)
+        for done in self.sim.star_done:
+            if task_clock.virtual:
+                # Offline the workers are waited for in real time, which the
+                # clock doesn't see, so every render moves the stars the same
+                while not (done.wait(0.25) or user_exit):
+                    pass
+            else:
+                yield Until(self.sim.ready, done)
 
-    def draw(self, gwin):
+    def draw(self, gwin, now):
         if self.starFieldControl == 1:
+            stars = self.stars
+            # There is no alpha in Graphics.py. Shading the colour by size
+            # is a rough equivalent to the JS r,g,b,alpha
+            shades = palette.shade(stars.colour.astype(int), stars.size / 2)
+            # is it still too small for a line? Then it is drawn as a line
+            # one pixel long, so each star keeps the one item as it grows
+            is_point = stars.size <= 2
+            lines = np.column_stack((
+                np.where(is_point, stars.x, stars.start_x),
+                np.where(is_point, stars.y, stars.start_y),
+                np.where(is_point, stars.x + 1, stars.x),
+                stars.y)).tolist()
+
             # Dodge the not drawn yet gotcha
-            if self.starFieldDrawn:
-                for star in self.stars:
-                    star.undraw()
-                    if user_exit:
-                        break
-
-            for star in self.stars:
-                star.draw(gwin)
-                if user_exit:
-                    break
+            if not self.starFieldDrawn:
+                self.starObjs = [gwin.line(*line, palette.shades[shade])
+                                 for line, shade in zip(lines,
+                                                        shades.tolist())]
+                self.canvas = gwin
+            else:
+                for starObj, line in zip(self.starObjs, lines):
+                    gwin.reshape_line(starObj, *line)
+                # only recolour the stars whose shade has changed
+                changed = np.flatnonzero(shades != self.drawn_shades)
+                for i, shade in zip(changed.tolist(),
+                                    shades[changed].tolist()):
+                    gwin.set_colour(self.starObjs[i], palette.shades[shade])
+            self.drawn_shades = shades
+
+            # update start of lines for next draw
+            stars.start_x[:] = stars.x
+            stars.start_y[:] = stars.y
             self.starFieldDrawn = True
             # signal new cycle
             self.starFieldControl = 0
+            self.drawn.set()
 
     def undraw(self):
         pass
 # .........................
 
 
-class StarFieldTask(threading.Thread):
+class FlightSim():
+    '''
+    Flies the stars and the moving seedheads in worker processes, each one
+    a slice of them, so the simulation can use more than one core. The
+    star arrays and the flight arrays of each SeedBatch are in shared
+    memory, so the workers move them in place and the render process draws
+    straight from them. A seedhead's SeedBatch gets a slot of that memory
+    from lend(), if one is free, and its draw states and canvas items stay
+    in the render process. A head without a slot flies in process.
+    The stars and the seeds are two jobs, each with its own generation.
+    The starfield task starts the stars' with step(), the render loop the
+    seeds' with fly() at the start of a frame, for every moving head it is
+    about to draw. Each worker copies a job's generation into its own slot
+    for that job when its share is done. Nothing is drawn till every slot
+    has caught up, and the workers only move them again at the next
+    generation, after the draw, so a frame is never drawn half moved.
+    '''
+    running = []  # Every FlightSim, for stopAll()
+
+    def __init__(self, stars, slot_seeds, slots, workers):
+        self.stars = stars
+        self.slot_seeds = slot_seeds
+        self.workers = workers
+        self.sizes = (stars, slot_seeds, slots, workers)
+        self.shm = shared_memory.SharedMemory(
+            create=True, size=flightMemorySize(*self.sizes))
+        (self.header, self.params, self.star_arrays, self.heads,
+         self.seed_arrays) = flightViews(self.shm.buf, *self.sizes)
+        self.header[:] = 0
+        self.lock = threading.Lock()
+        self.free_slots = list(range(slots))
+        self.go = [multiprocessing.Event() for w in range(workers)]
+        self.star_done = [multiprocessing.Event() for w in range(workers)]
+        self.seed_done = [multiprocessing.Event() for w in range(workers)]
+        self.processes = []
+        # Running totals for stats()
+        self.frames = 0
+        self.heads_flown = 0
+        self.seeds_flown = 0
+        self.heads_in_process = 0
+        self.wait_time = 0
+        FlightSim.running.append(self)
+
+    def start(self, rng):
+        # Start the workers, each with its own random stream from rng
+        bounds = np.linspace(0, self.stars, self.workers + 1).astype(int)
+        seeds = rng.integers(0, 2 ** 63, self.workers).tolist()
+        for w in range(self.workers):
+            process = multiprocessing.Process(
+                target=flightWorker, daemon=True,
+                args=(self.shm.name, self.sizes, w,
+                      int(bounds[w]), int(bounds[w + 1]), seeds[w],
+                      self.go[w], self.star_done[w], self.seed_done[w]))
+            process.start()
+            self.processes.append(process)
+
+    def lend(self, capacity):
+        # A free slot for a SeedBatch of capacity seeds, as (slot, arrays)
+        # set as a new SeedBatch's would be, or None if there isn't one
+        if capacity > self.slot_seeds:
+            return None
+        with self.lock:
+            if not self.free_slots:
+                return None
+            slot = self.free_slots.pop()
+        arrays = {name: a[slot, :capacity]
+                  for name, a in self.seed_arrays.items()}
+        for a in arrays.values():
+            a[:] = 0
+        arrays['radSize'][:] = SeedBatch.start_size
+        return slot, arrays
+
+    def give_back(self, slot):
+        # Called once the seedhead lent the slot has gone
+        with self.lock:
+            self.free_slots.append(slot)
+
+    def step(self, line_length, line_length_adjust, cx, cy, warp):
+        # Set the workers moving the stars on a frame
+        # Cleared before the generation goes up, as a worker still awake
+        # from the seeds could see it and be done before go is set
+        for done in self.star_done:
+            done.clear()
+        self.params[:] = (line_length, line_length_adjust, cx, cy, warp)
+        self.header[0] += 1
+        for go in self.go:
+            go.set()
+
+    def ready(self):
+        # Has every worker moved the stars of the current generation
+        w = self.workers
+        return bool((self.header[4:4 + w] == self.header[0]).all())
+
+    def fly(self, drawn, gwin, now):
+        '''
+        Readies every moving seedhead in drawn for its draw() and has the
+        workers fly those with a slot on to frame time now, their seeds
+        shared out evenly between the workers. Returns once they are all
+        flown
+        '''
+        rows = 0
+        for drawn_obj in drawn:
+            if not isinstance(drawn_obj, SeedHead) or not drawn_obj.motion:
+                continue
+            if drawn_obj.flight_slot is None:
+                self.heads_in_process += 1
+                continue
+            n = drawn_obj.readyToFly(gwin, now)
+            drawn_obj.flown = n
+            self.heads[rows] = (drawn_obj.flight_slot, n,
+                                drawn_obj.flight_speed, now, centerX,
+                                centerY, drawn_obj.flight == 'closed')
+            self.seeds_flown += n
+            rows += 1
+        self.frames += 1
+        self.heads_flown += rows
+        if not rows:
+            return
+        start = time.perf_counter()
+        # Cleared before the generation goes up, as in step()
+        for done in self.seed_done:
+            done.clear()
+        self.header[3] = rows
+        self.header[2] += 1
+        for go in self.go:
+            go.set()
+        for done in self.seed_done:
+            while not (done.wait(0.25) or user_exit):
+                pass
+        self.wait_time += time.perf_counter() - start
+
+    def stats(self):
+        frames = max(self.frames, 1)
+        w = self.workers
+        # Each worker's CPU time flying seeds, to compare with the wait for
+        # them
+        busy = self.header[4 + 2 * w:4 + 3 * w] / 1e6 / frames
+        return {'workers': w,
+                'heads_per_frame': round(self.heads_flown / frames, 2),
+                'seeds_per_frame': round(self.seeds_flown / frames, 1),
+                'in_process_per_frame':
+                    round(self.heads_in_process / frames, 2),
+                'wait_ms_per_frame':
+                    round(self.wait_time * 1000 / frames, 3),
+                'worker_ms_per_frame': [round(b, 3) for b in busy.tolist()],
+                'free_slots': len(self.free_slots)}
+
+    def stop(self):
+        self.header[1] = 1
+        for go in self.go:
+            go.set()
+        for process in self.processes:
+            process.join()
+        # The seedheads' and starfield's arrays still map the memory till
+        # they go
+        self.shm.unlink()
+
+    @staticmethod
+    def stopAll():
+        while FlightSim.running:
+            FlightSim.running.pop().stop()
+
+
+# The FlightSim of flight_processes, made by startTasks()
+flight_sim = None
+# .........................
+
+
+class StarFieldTask(SteppedTask):
     """Animated star field from original js code by sebi@timewaster.de
 
     """
@@ -722,7 +2882,7 @@ class StarFieldTask(threading.Thread):
         # setup task controller interface
         self.seqr = Sequencer()
 
-    def run(self):
+    def steps(self):
         '''
         starFieldControl
         0 = update
@@ -733,9 +2893,9 @@ class StarFieldTask(threading.Thread):
         line_length_adjust = 0.5
 
         while not user_exit:
-            # Setup Star class var for warp ctl
-            Star.s_warp = StarFieldTask.sft_warp
-            start = time.time()
+            # Pass on warp ctl for restarted stars
+            self.star_field.warp = StarFieldTask.sft_warp
+            start = task_clock.time()
             #Warp is flagged create an accelleration effect
             #With flight_period
             if StarFieldTask.sft_warp:
@@ -749,29 +2909,16 @@ class StarFieldTask(threading.Thread):
             #to control the speed of stars, and their line length
             line_length = flight_period * lull_period
 
-            for star in self.star_field.stars:
-                # calc new position and size
-                # Al star paths expand in x&y at size*flight_period
-                # This assumes no star will hit us!
-                star.x += (star.x - centerX) * star.size * \
-                    line_length * line_length_adjust
-                star.y += (star.y - centerY) * star.size * \
-                    line_length * line_length_adjust
-                star.size += line_length
-                # check if star is now outside display win
-                if (star.x < 0 or star.x > winWdth or star.y < 0 or star.y > winHt):
-                    star.restart(1)
-
-                if user_exit:
-                    break
+            yield from self.star_field.move(line_length, line_length_adjust)
 
-            end = time.time()
-            frameTimer(start, end, 1)
+            end = task_clock.time()
+            yield frameWait(start, end, 1)
             # Signal ready to draw
+            self.star_field.drawn.clear()
             self.star_field.starFieldControl = 1
             # Wait till drawn
-            while not user_exit and self.star_field.starFieldControl != 0:
-                time.sleep(0.0001)
+            yield Until(lambda: self.star_field.starFieldControl == 0,
+                        self.star_field.drawn)
 
 #########################################
 
@@ -790,8 +2937,8 @@ class Sequencer():
     c_warped = False
 
     def __init__(self):
-        self.start_time = time.time()
-        self.warp_lapse_time = time.time() + self.get_warp_time()
+        self.start_time = task_clock.time()
+        self.warp_lapse_time = task_clock.time() + self.get_warp_time()
         self.dodge_warp = 0
         self.set_dodge_warp()
 
@@ -805,35 +2952,42 @@ class Sequencer():
         # setup pause control
         self.setTaskCtlDict(task_id, False, 4)
 
-    def setTaskCtlDict(self, task_id, pause_state, delay):
-        # Sets up the sync control for a task
-        try:
-            Sequencer.task_ctl_dict[task_id]['pause'] = pause_state
-            Sequencer.task_ctl_dict[task_id]['delay'] = delay
-            Sequencer.task_ctl_dict[task_id]['paused'] = False
-        except:
-            Sequencer.task_ctl_dict[task_id] = {
-                'pause': pause_state, 'delay': delay, 'paused': False}
+    def setTaskCtlDict(self, task_id, pause_state, jitter):
+        # Sets up the sync control for a task. Its 'resume' event is set
+        # while it may run and its 'paused' event while it sits paused.
+        # Once resumed it restarts after a random delay of up to jitter secs
+        t = Sequencer.task_ctl_dict.setdefault(task_id, {})
+        if 'resume' not in t:
+            t['resume'] = threading.Event()
+            t['paused'] = threading.Event()
+        t['jitter'] = jitter
+        self._set_pause(t, pause_state)
+
+    def _set_pause(self, t, pause_state):
+        if pause_state:
+            t['resume'].clear()
+        else:
+            t['resume'].set()
 
     def getTaskFromDict(self, task_id):
         pass
 
     def checkForWarp(self):
         # Is the current warp period over
-        if self.warp_lapse_time <= time.time():
+        if self.warp_lapse_time <= task_clock.time():
             return True
         return False
 
-    def pause_task(self, delay):
+    def pause_task(self, jitter):
         # Signal tasks to pause
-        # Set up the pause 'tick' in seconds and control flag for each task
+        # Set up the restart jitter in seconds and pause each task
         for t in Sequencer.task_ctl_dict:
-            self.setTaskCtlDict(t, True, delay)
+            self.setTaskCtlDict(t, True, jitter)
 
     def flag_pause_task(self, pause_state):
         # task pause flag set
         for val in Sequencer.task_ctl_dict.values():
-            val['pause'] = pause_state
+            self._set_pause(val, pause_state)
 
     def sequenceControl(self):
         '''
@@ -856,21 +3010,24 @@ class Sequencer():
                 # 1 dodge warp - ie don't do the warp everytime its signalled!,
                 # 2 if dodge warp has expired setup sync signal for T3
                 # 3 wait for task 3 to pause and setup warp
+                t3 = Sequencer.task_ctl_dict[3]
                 if self.dodge_warp > 0:
                     self.set_warp_lapse_time(self.get_warp_time())
                     self.dodge_warp -= 1
                     print(f"Warp: dodge={self.dodge_warp}")
-                elif Sequencer.task_ctl_dict[3]['paused'] == False:
-                    # setup the sync signal for the main task
-                    self.setTaskCtlDict(3, True, 8)
-                    self.set_warp_lapse_time(2)
+                elif not t3['paused'].is_set():
+                    # setup the sync signal for the main task, then look
+                    # again each frame till task 3 has paused
+                    if t3['resume'].is_set():
+                        self.setTaskCtlDict(3, True, 8)
+                    self.set_warp_lapse_time(0)
                 else:
                     # Task 3 is paused so set the warp signal
                     Sequencer.c_warped = True
                     # Signal to starfield to start warp
                     StarFieldTask.sft_warp = True
-                    # Create the base 'tick' in seconds for each task
-                    # To poll for the next operational period
+                    # Pause every task, each restarting up to 8 seconds
+                    # after the warp ends
                     self.pause_task(8)
                     # Set the actual warp length
                     self.set_warp_lapse_time(self.get_warp_time())
@@ -882,8 +3039,8 @@ class Sequencer():
             self.dodge_warp = random.randint(4, 12)
 
     def set_warp_lapse_time(self, lapse):
-        self.pause_lapse_time = time.time()
-        self.warp_lapse_time = time.time() + lapse
+        self.pause_lapse_time = task_clock.time()
+        self.warp_lapse_time = task_clock.time() + lapse
 
     def get_warp_time(self):
         # Provides a range of periods in seconds for warp
@@ -893,32 +3050,18 @@ class Sequencer():
 
     def taskControl(self, task_id):
         # When in a warp period this controller holds all
-        # Signalled tasks, back. each task's pause status is polled at the
-        # tick rate set for each task - this helps maintain some sort of 'slopp'
-        # in the timing of each task's restart.
+        # Signalled tasks, back. A task is released the moment it is
+        # resumed, then waits a random jitter of up to its 'jitter' secs -
+        # this keeps some sort of 'slopp' in the timing of each task's restart.
 
         t = Sequencer.task_ctl_dict[task_id]
         #print(f"task: {task_id} warped: {Sequencer.c_warped}")
-        ctr = 0
-        while t['pause']:
-            t['paused'] = True
-            time.sleep(t['delay'])
-            ctr += 1
-        #print(f"task paused:{task_id} by ctr {ctr} x {t['delay']}")
-        t['paused'] = False
-
-    def taskControlGen(self, task_id):
-        # This is a generator version of the task sync controller above.
-        while not user_exit:
-            ctr = 0
-            t = Sequencer.task_ctl_dict[task_id]
-            while t['pause']:
-                t['paused'] = True
-                time.sleep(t['delay'])
-                ctr += 1
-            #print(f"task paused:{task_id} by ctr {ctr} x {t['delay']}")
-            t['paused'] = False
-            yield
+        if not t['resume'].is_set():
+            t['paused'].set()
+            yield Until(t['resume'].is_set, t['resume'])
+            t['paused'].clear()
+            if not user_exit:
+                yield random.random() * t['jitter']
 
 ########################################
 
@@ -941,6 +3084,8 @@ class MouseGrapWin(GraphWin):
         self.master.geometry(f"{w}x{h}+0+0")
         winWdth = w
         winHt = h
+        self.screen_w = w
+        self.screen_h = h
 
         # Hide Titlebar
         self.master.wm_overrideredirect(True)
@@ -957,9 +3102,202 @@ class MouseGrapWin(GraphWin):
     def mouse_xy(self):
         return(self.mouse_x, self.mouse_y)
 
+    def screen_size(self):
+        return(self.screen_w, self.screen_h)
+
 
 ########################################
 # funcs
+def linearRadius(seed, scale):
+    # The original spiral, each seed sits scale pixels further out than the
+    # one before
+    return seed * scale
+# .........................
+
+
+def vogelRadius(seed, scale):
+    # Vogel's model, the radius grows with the square root of the seed number
+    # which spreads the seeds evenly. It matches the linear spiral at seeds
+    return scale * math.sqrt(seeds) * np.sqrt(seed)
+# .........................
+
+
+def logRadius(seed, scale):
+    # The radius grows with the log of the seed number, packing the outer
+    # seeds ever tighter. It matches the linear spiral at seeds
+    return scale * seeds * np.log1p(seed) / math.log1p(seeds)
+# .........................
+
+
+def seedSpiral(seed_count, phi, scale, law):
+    '''
+    Calculates where every seed of a seedhead sits relative to its centre, as
+    one batch of numpy array maths rather than a seed at a time. The seed
+    radius (vector) comes from the head's spiral law kernel and scale.
+    The central seeds are thinned out in the same way as before: seeds whose
+    vector falls inside 'middle' are counted (sml_vec) and any past the first
+    'middle' of them are dropped.
+    Returns the numbers of the seeds drawn and an int array of shape
+    (seeds drawn, 2) holding dx, dy per seed.
+    '''
+    seed = np.arange(1, seed_count, dtype=np.float64)
+    vector = spiral_laws[law](seed, scale)
+    middle = 2.0 / scale
+    # restrict the number of central seeds
+    inner = vector < middle
+    sml_vec = np.cumsum(inner)
+    draw = ~(inner & (sml_vec > middle))
+    seed = seed[draw]
+    vector = vector[draw]
+    rotPerFrame = np.fmod(seed * 360.0 * phi, 360)
+    # Translate from polar - vector & rotPerFrame to cartesian - dx, dy
+    # truncated towards zero as fix() does
+    offsets = np.empty((len(seed), 2), dtype=np.int32)
+    offsets[:, 0] = np.trunc(vector * np.cos(dToRads * rotPerFrame))
+    offsets[:, 1] = np.trunc(vector * np.sin(dToRads * rotPerFrame))
+    return seed, offsets
+# .........................
+
+
+def storeLayout(job):
+    # LayoutStore process pool worker. Returns a layout as rows of
+    # seed number, dx, dy
+    phi, scale, law, seed_count = job
+    seed, offsets = seedSpiral(seed_count, phi, scale, law)
+    return np.column_stack((seed, offsets)).astype('<i4')
+# .........................
+
+
+def layoutJobs(specs):
+    '''
+    Lists the layouts, as (phi, scale, law, seed_count), that heads built
+    from these specs can ask for. The layout for fewer seeds is just the
+    start of the layout for more, so only the biggest seed_count is needed.
+    '''
+    seed_counts = {}
+    for spec in specs:
+        key = (spec['scale'], spec['law'])
+        seed_counts[key] = max(seed_counts.get(key, 0), spec['seed_count'])
+    return sorted([phi, s, law, n] for phi in set(head_shape_choices)
+                  for (s, law), n in seed_counts.items())
+# .........................
+
+
+# The seed radius kernels a seedhead spec's 'law' can choose from
+spiral_laws = {'linear': linearRadius,
+               'vogel': vogelRadius,
+               'log': logRadius}
+
+
+def starCount(star_density):
+    # How many stars a StarField of star_density has
+    return int(winWdth * winHt / 1000 * star_density)
+# .........................
+
+
+def flightMemorySize(stars, slot_seeds, slots, workers):
+    # Bytes of shared memory a FlightSim needs, see flightViews()
+    return 8 * (4 + 3 * workers + 5 + stars * len(StarBatch.names) +
+                slots * 7 + slots * slot_seeds * len(SeedBatch.names))
+# .........................
+
+
+def flightViews(buf, stars, slot_seeds, slots, workers):
+    '''
+    The numpy views of a FlightSim's shared memory. The header holds the
+    stars' generation, the stop flag, the seeds' generation and how many
+    heads are in the heads table, then each worker's finished generation
+    of the stars, of the seeds, and its CPU time flying seeds in ns. Then
+    come the step() params, the star arrays of a StarBatch, the heads
+    table of fly(), a row per head of (slot, seed count, flight speed,
+    frame time, cx, cy, closed), and the SeedBatch flight arrays, a row per
+    slot.
+    '''
+    header = np.ndarray((4 + 3 * workers,), dtype=np.int64, buffer=buf)
+    offset = header.nbytes
+    params = np.ndarray((5,), dtype=np.float64, buffer=buf, offset=offset)
+    offset += params.nbytes
+    star_arrays = {}
+    for name in StarBatch.names:
+        star_arrays[name] = np.ndarray((stars,), dtype=np.float64,
+                                       buffer=buf, offset=offset)
+        offset += star_arrays[name].nbytes
+    heads = np.ndarray((slots, 7), dtype=np.float64, buffer=buf,
+                       offset=offset)
+    offset += heads.nbytes
+    seed_arrays = {}
+    for name in SeedBatch.names:
+        seed_arrays[name] = np.ndarray((slots, slot_seeds),
+                                       dtype=np.float64, buffer=buf,
+                                       offset=offset)
+        offset += seed_arrays[name].nbytes
+    return header, params, star_arrays, heads, seed_arrays
+# .........................
+
+
+def flightWorker(shm_name, sizes, index, lo, hi, seed, go, star_done,
+                 seed_done):
+    '''
+    A FlightSim worker process. Each time it is set going it moves stars lo
+    to hi if there is a new generation of them, and its share of the seeds
+    in the heads table if there is a new generation of seeds, till it is
+    stopped
+    '''
+    workers = sizes[3]
+    shm = shared_memory.SharedMemory(name=shm_name)
+    header, params, star_arrays, heads, seed_arrays = flightViews(
+        shm.buf, *sizes)
+    stars = StarBatch(hi - lo, np.random.default_rng(seed),
+                      {name: a[lo:hi] for name, a in star_arrays.items()})
+    # A SeedBatch on each slot, as lent to the seedheads
+    slots = [SeedBatch(sizes[1], {name: a[slot]
+                                  for name, a in seed_arrays.items()})
+             for slot in range(sizes[2])]
+    star_slot = 4 + index
+    seed_slot = 4 + workers + index
+    while True:
+        go.wait()
+        # Cleared before the generations are read, so one set meanwhile
+        # goes round again
+        go.clear()
+        if header[1]:
+            break
+        if header[star_slot] != header[0]:
+            line_length, line_length_adjust, cx, cy, warp = params.tolist()
+            stars.move(line_length, line_length_adjust, cx, cy, bool(warp))
+            header[star_slot] = header[0]
+            star_done.set()
+        if header[seed_slot] != header[2]:
+            start = time.process_time_ns()
+            rows = heads[:header[3]].tolist()
+            # The seeds fly independently, so the heads' seeds are taken
+            # end to end and each worker flies an even run of them. Heads
+            # are mostly small, so it has as few of them to fly as it can
+            total = sum(int(row[1]) for row in rows)
+            begin = total * index // workers
+            end = total * (index + 1) // workers
+            offset = 0
+            for slot, n, flight_speed, now, cx, cy, closed in rows:
+                first = max(begin - offset, 0)
+                last = min(end - offset, int(n))
+                offset += int(n)
+                if first >= last:
+                    continue
+                if closed:
+                    slots[int(slot)].fly_to(last, flight_speed, now, cx, cy,
+                                            first)
+                else:
+                    slots[int(slot)].motion(last, flight_speed, now, cx, cy,
+                                            first)
+            header[4 + 2 * workers + index] += time.process_time_ns() - start
+            header[seed_slot] = header[2]
+            seed_done.set()
+    # The views have to go before the memory can be let go of
+    del stars, slots, header, params, star_arrays, heads, seed_arrays
+    shm.close()
+# .........................
+
+
 def fix(no):
     int_no = 0
     if no >= 0:
@@ -976,18 +3314,11 @@ def checkBreak(win):
 
 
 def drawControl(task_id, drawn_obj):
+    # The drawing interface given to tasks, None stops the task being drawn
     if drawn_obj == None:
-        for dc in draw_control_ary:
-            if dc[0] == task_id:
-                draw_control_ary.remove(dc)
-            break
+        draw_registry.unregister(task_id)
     else:
-        for dc in draw_control_ary:
-            if dc[0] == task_id:
-                dc[1] = drawn_obj
-                break
-        else:
-            draw_control_ary.append([task_id, drawn_obj])
+        draw_registry.register(task_id, drawn_obj)
 
 # .........................
 
@@ -1012,13 +3343,13 @@ def mousePos(win):
 # .........................
 
 
-def frameTimer(start, end, frames):
+def frameWait(start, end, frames):
     '''
     Provides some control over the framerate of tasks using it.
     The idea is that regardless of the processing time in each frame
     the framerate remains constant. The task sleeps for the remaining
-    portion. This also de-schedules the task. I think this help other threads
-    do stuff.
+    portion, which is returned for it to yield. This also de-schedules the
+    task. I think this help other threads do stuff.
     '''
     global lull_period
     draw_time = end - start
@@ -1026,10 +3357,10 @@ def frameTimer(start, end, frames):
     time_left = time_given - draw_time
 
     if time_left > 0:
-        time.sleep(time_left)
+        return time_left
 
     else:
-        time.sleep(0.001)
+        return 0.001
 # .........................
 
 
@@ -1059,96 +3390,278 @@ def mainFrameTimer(start, end, frames):
             lull_period -= lull_decrement
         time.sleep(0.001)
         return(True, time_left)
+# .........................
 
-######################################
-
-
-def main():
-    win = MouseGrapWin(
-        'Starfield and Fibonacci Seedhead Animated Patterns', winWdth, winHt)
-    win.setBackground('black')
-    message = Text(Point(win.getWidth() - 200, win.getWidth() - 10),
-                   'Fibonacci Seed Head - SRRose, Romanviii.co.uk')
-    message.setFace('arial')
-    # message.setStyle('bold')
-    message.setTextColor('white')
-    message.draw(win)
-
-    global user_exit
-    global frameTime
-
-    # Wait for user to click
-    click_msg = Text(Point((win.getWidth() / 2) - 30,
-                           win.getWidth() / 2), 'Click Mouse To Start & End!')
-    click_msg.setFace('arial')
-    click_msg.setTextColor('white')
-    click_msg.draw(win)
 
-    while checkBreak(win):
-        time.sleep(0.2)
+def printStats():
+    '''
+    Prints the performance counters of the various subsystems
+    '''
+    print(f"Layout cache: {layout_cache.stats()}")
+    print(f"Seed culler: {seed_culler.stats()}")
+    print(f"Viewport culler: {viewport_culler.stats()}")
+    print(f"Seed pool: {seed_pool.stats()}")
+    print(f"Task timing: {task_timing.stats()}")
+    if flight_sim is not None:
+        print(f"Flight sim: {flight_sim.stats()}")
+    if canvas_items is not None:
+        print(f"Canvas items: {canvas_items.stats()}")
+# .........................
 
-    click_msg.undraw()
 
+def startTasks(sequencer, gwin, start_task):
+    '''
+    Sets up the seedhead and starfield tasks, starting each one with
+    start_task, and adds them to the sequencer
+    '''
     x = winWdth / 2.0
     y = winHt / 2.0
 
-    user_exit = False
-
-    # Setup Sequencer
-    sequencer = Sequencer()
-
     # Seedhead specification dicts for the 3 heads to be drawn
     seed_spec1 = {'x': x, 'y': y, 'colour': 'white', 'size': 3,
                   'speed': 2, 'seed_count': 500, 'scale': 0.5,
-                  'phi': Fib_ratio, 'motion': False}
+                  'phi': Fib_ratio, 'motion': False, 'law': 'linear',
+                  'flight': 'step'}
 
     seed_spec2 = {'x': x, 'y': y, 'colour': 'red', 'size': 'rand',
                   'speed': 2, 'seed_count': 900, 'scale': 0.01,
-                  'phi': Fib_ratio, 'motion': True}
+                  'phi': Fib_ratio, 'motion': True, 'law': 'linear',
+                  'flight': 'step'}
 
     seed_spec3 = {'x': x, 'y': y, 'colour': 'yellow', 'size': 'rand',
                   'speed': 2, 'seed_count': 800, 'scale': 0.005,
-                  'phi': Fib_ratio, 'motion': True}
+                  'phi': Fib_ratio, 'motion': True, 'law': 'linear',
+                  'flight': 'step'}
 
     seed_spec4 = {'x': x, 'y': y, 'colour': 'blue', 'size': 'rand',
                   'speed': 0.5, 'seed_count': 500, 'scale': 0.005,
-                  'phi': Fib_ratio, 'motion': True}
+                  'phi': Fib_ratio, 'motion': True, 'law': 'linear',
+                  'flight': 'step'}
 
     seed_spec5 = {'x': x, 'y': y, 'colour': 'blue', 'size': 1,
                   'speed': 1, 'seed_count': 250, 'scale': 0.5,
-                  'phi': Fib_ratio, 'motion': False}
+                  'phi': Fib_ratio, 'motion': False, 'law': 'linear',
+                  'flight': 'step'}
+
+    # Memory map the precomputed layouts, building them first if need be
+    if layout_store_file:
+        layout_cache.store = LayoutStore(layout_store_file, layoutJobs(
+            [seed_spec1, seed_spec2, seed_spec3, seed_spec4, seed_spec5]))
+
+    # Made before any seedhead, so they can all have a slot, and its
+    # workers forked before any task is running, so none can start with a
+    # lock a task held
+    global flight_sim
+    if flight_processes:
+        flight_sim = FlightSim(
+            starCount(star_density),
+            max(spec['seed_count'] for spec in
+                [seed_spec1, seed_spec2, seed_spec3, seed_spec4, seed_spec5]),
+            flight_slots, flight_processes)
+        flight_sim.start(np.random.default_rng(random.getrandbits(64)))
 
     # Starting threads for each seed head
 
-    #t1=SeedHeadTask1(1,seed_spec1, 0, drawControl).start()
+    #t1=start_task(SeedHeadTask1(1,seed_spec1, 0, drawControl))
 
-    #t2=SeedHeadTask2(2,seed_spec2, 4, drawControl).start()
+    #t2=start_task(SeedHeadTask2(2,seed_spec2, 4, drawControl))
 
-    t3 = SeedHeadTask2(3, seed_spec3, 8, drawControl).start()
+    t3 = start_task(SeedHeadTask2(3, seed_spec3, 8, drawControl))
     sequencer.addTaskToDict(3, {'task': t3})
 
-    #t4=SeedHeadRandPosTask3(4,seed_spec4, 2, drawControl).start()
-    #t5=SeedHeadRandPosTask3(5,seed_spec4, 4, drawControl).start()
+    #t4=start_task(SeedHeadRandPosTask3(4,seed_spec4, 2, drawControl))
+    #t5=start_task(SeedHeadRandPosTask3(5,seed_spec4, 4, drawControl))
 
-    t6 = SeedHeadRandPosTask3(6, seed_spec4, 6, drawControl).start()
+    t6 = start_task(SeedHeadRandPosTask3(6, seed_spec4, 6, drawControl))
     sequencer.addTaskToDict(6, {'task': t6})
 
-    t7 = SeedHeadRandPosTask3(7, seed_spec4, 8, drawControl).start()
+    t7 = start_task(SeedHeadRandPosTask3(7, seed_spec4, 8, drawControl))
     sequencer.addTaskToDict(7, {'task': t7})
 
     for t in range(8, 15):
-        tsk = SeedHeadRandPosTask3(t, seed_spec5, random.choice(
-            [1, 2, 1, 3, 2, 1]), drawControl).start()
+        tsk = start_task(SeedHeadRandPosTask3(t, seed_spec5, random.choice(
+            [1, 2, 1, 3, 2, 1]), drawControl))
         sequencer.addTaskToDict(t, {'task': tsk})
 
-    st1 = StarFieldTask(16, star_density, win, 2, drawControl).start()
+    st1 = start_task(StarFieldTask(16, star_density, gwin, 2, drawControl))
     sequencer.addTaskToDict(16, {'task': st1})
+# .........................
+
+
+def writePNG(path, frame):
+    '''
+    Writes an RGB frame as a PNG file, with just zlib so no imaging
+    library is needed
+    '''
+    height, width, _ = frame.shape
+    # Each row starts with filter type 0, none
+    rows = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 1:] = frame.reshape(height, -1)
+
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data +
+                struct.pack('>I', zlib.crc32(kind + data)))
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height,
+                                           8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(rows.tobytes(), 6)))
+        f.write(chunk(b'IEND', b''))
+# .........................
+
+
+def renderOffline():
+    '''
+    Renders offline_seconds of the animation at offline_fps into
+    offline_output, with no window. The tasks run on a VirtualClock and
+    random is seeded with offline_seed, so every run gives the same frames.
+    The starfield centre stays in the middle, there being no mouse.
+    With render_backend 'null' nothing is drawn or saved, for timing the
+    animation on its own. With task_mode 'asyncio' the tasks run between
+    frames as coroutines, and the clock just tells the time.
+    '''
+    global task_clock
+    global user_exit
+    global canvas_items
+    global flight_sim
+
+    random.seed(offline_seed)
+    clock = VirtualClock()
+    task_clock = clock
+    frame_clock.now = clock.now
+    user_exit = False
+
+    sequencer = Sequencer()
+    frame_tasks = None
+    if task_mode == 'asyncio':
+        frame_tasks = FrameTasks()
+        startTasks(sequencer, None, frame_tasks.start)
+    else:
+        startTasks(sequencer, None, clock.start)
+    # The null backend runs the animation without drawing or saving frames
+    save = render_backend != 'null'
+    if save:
+        canvas_items = RasterCanvas(winWdth, winHt, 'black')
+    else:
+        canvas_items = NullBackend()
+
+    raw = None
+    if save and not offline_output.lower().endswith('.png'):
+        raw = open(offline_output, 'wb')
+    stats_time = stats_period
+    try:
+        for frame in range(int(offline_seconds * offline_fps)):
+            clock.advance(frame / offline_fps)
+            start = frame_clock.tick()
+            if frame_tasks is not None:
+                frame_tasks.run_frame(start)
+            task_timing.new_frame(start)
+            drawn = draw_registry.snapshot
+            if flight_sim is not None:
+                flight_sim.fly(drawn, canvas_items, start)
+            for drawn_obj in drawn:
+                drawn_obj.draw(canvas_items, start)
+            seed_culler.new_frame()
+            viewport_culler.new_frame()
+            canvas_items.new_frame()
+            if raw is not None:
+                raw.write(canvas_items.frame.tobytes())
+            elif save:
+                writePNG(offline_output.format(frame), canvas_items.frame)
+            sequencer.sequenceControl()
+
+            if stats_period and start >= stats_time:
+                printStats()
+                stats_time = start + stats_period
+    finally:
+        if raw is not None:
+            raw.close()
+        # Release any paused tasks so they can all finish
+        user_exit = True
+        sequencer.flag_pause_task(False)
+        if frame_tasks is not None:
+            frame_tasks.stop()
+        clock.stop()
+        task_clock = RealClock()
+        FlightSim.stopAll()
+        flight_sim = None
+
+######################################
+
+
+def main():
+    if graphics_error is not None:
+        # No display to open the window on, only renderOffline() can run
+        raise graphics_error
+    win = MouseGrapWin(
+        'Starfield and Fibonacci Seedhead Animated Patterns', winWdth, winHt)
+    win.setBackground('black')
+    message = Text(Point(win.getWidth() - 200, win.getWidth() - 10),
+                   'Fibonacci Seed Head - SRRose, Romanviii.co.uk')
+    message.setFace('arial')
+    # message.setStyle('bold')
+    message.setTextColor('white')
+    message.draw(win)
+
+    global user_exit
+    global frameTime
+
+    # Wait for user to click
+    click_msg = Text(Point((win.getWidth() / 2) - 30,
+                           win.getWidth() / 2), 'Click Mouse To Start & End!')
+    click_msg.setFace('arial')
+    click_msg.setTextColor('white')
+    click_msg.draw(win)
 
     while checkBreak(win):
-        start = time.time()
+        time.sleep(0.2)
+
+    click_msg.undraw()
+
+    user_exit = False
+
+    # Setup Sequencer
+    sequencer = Sequencer()
+    frame_tasks = None
+    if task_mode == 'asyncio':
+        frame_tasks = FrameTasks()
+        startTasks(sequencer, win, frame_tasks.start)
+    else:
+        startTasks(sequencer, win, threading.Thread.start)
+
+    # Everything is drawn through the chosen backend
+    global canvas_items
+    if render_backend == 'raster':
+        canvas_items = RasterCanvas(int(win.getWidth()), int(win.getHeight()),
+                                    win.cget('background'), win)
+    elif render_backend == 'graphics':
+        canvas_items = GraphicsBackend(win)
+    elif render_backend == 'null':
+        canvas_items = NullBackend()
+    else:
+        canvas_items = CanvasRecycler(win, canvas_pool_size)
+    # Moving seeds are retired once they leave what's actually on screen
+    viewport_culler.set_bounds(*win.screen_size())
+
+    stats_time = time.time() + stats_period
+    while checkBreak(win):
+        # The one clock reading for everything drawn in this frame
+        start = frame_clock.tick()
+        if frame_tasks is not None:
+            # The tasks' turn, between frames
+            frame_tasks.run_frame(start)
+        task_timing.new_frame(start)
         win.autoflush = False
-        for task in draw_control_ary:
-            task[1].draw(win)
+        drawn = draw_registry.snapshot
+        if flight_sim is not None:
+            # The moving seedheads flown by the workers, ready to draw
+            flight_sim.fly(drawn, canvas_items, start)
+        for drawn_obj in drawn:
+            drawn_obj.draw(canvas_items, start)
+        seed_culler.new_frame()
+        viewport_culler.new_frame()
+        canvas_items.new_frame()
         end = time.time()
         time_over, time_left = mainFrameTimer(start, end, 1)
         win.autoflush = True
@@ -1161,10 +3674,21 @@ def main():
 
         sequencer.sequenceControl()
 
+        if stats_period and start >= stats_time:
+            printStats()
+            stats_time = start + stats_period
+
     user_exit = True
+    if frame_tasks is not None:
+        frame_tasks.stop()
+    FlightSim.stopAll()
 
     if not win.isClosed():
         win.close()
 
 
-main()
+if __name__ == '__main__':
+    if offline_output:
+        renderOffline()
+    else:
+        main()